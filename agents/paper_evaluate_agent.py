@@ -7,15 +7,24 @@ from langchain.agents import create_react_agent
 from tools.tools import (
     generate_review,
     load_path,
+    set_path,
     fetch_all_section_titles,
     get_openreview_reviews,
+    clear_run_state,
 )
+from tools import question_ranker, resources, tracing
+from tools.llm_cache import install_llm_cache
 import os
 
 os.environ["KMP_DUPLICATE_LIB_OK"] = "True"
 
 
-def evaluate_paper():
+def evaluate_paper(manuscript_path: str = None, callbacks: list = None):
+    """
+    Reviews a manuscript with the ReAct agent. The manuscript path is read from
+    tools/current_path.txt unless manuscript_path is given, and callbacks are
+    passed on to the agent run.
+    """
     ResearchQuestion = CriteriaAspect(1, "Research Question", "the questions that the manuscript tries to answer or solve.")
     ResearchQuestion.add_question("Are the research question(s) clearly stated by the authors?") # MaryShaw 2003, Thesien 2017, Wohlin 2015
     ResearchQuestion.add_question("Is the research question related to software engineering?") # Thesien 2017
@@ -161,41 +170,61 @@ def evaluate_paper():
         # )
     ]
 
-    path = load_path()
-    section_title_list = fetch_all_section_titles()
-    section_title_str = ("\n").join(section_title_list)
-
-    initial_input = f"Can you please review the the manuscript located at: '{path}'?\n\nHere are the section titles of the manuscript:\n{section_title_str}"
-
-    llm = OpenAI(temperature=0, model="gpt-4o")  # gpt-4o
-
-    prompt = PromptTemplate(
-        input_variables=["input", "agent_scratchpad"], template=template
-    )
-
-    agent = create_react_agent(
-        llm,
-        tools,
-        prompt,
-    )
-
-    agent_chain = AgentExecutor(
-        agent=agent,
-        tools=tools,
-        verbose=True,
-        handle_parsing_errors=True,
-    )
-
-    # for section_title in section_title_list:
-    #     input_prompt = f"Can you please review the the manuscript located at: '{path}'?\nPlease review the section titled: '{section_title}'"
-    #     agent_chain.invoke(
-    #         {
-    #             "input": input_prompt,
-    #         }
-    #     )
-
-    agent_chain.invoke(
-        {
-            "input": initial_input,
-        }
-    )
+    tracing.start_run("agent")
+    try:
+        if manuscript_path is None:
+            path = load_path()
+        else:
+            path = set_path(manuscript_path)
+        section_title_list = fetch_all_section_titles()
+        section_title_str = ("\n").join(section_title_list)
+
+        with tracing.span("load_resources"):
+            resources.warm_up()
+        print(resources.get_load_report())
+
+        initial_input = f"Can you please review the the manuscript located at: '{path}'?\n\nHere are the section titles of the manuscript:\n{section_title_str}"
+
+        install_llm_cache()
+        llm = OpenAI(temperature=0, model="gpt-4o")  # gpt-4o
+
+        prompt = PromptTemplate(
+            input_variables=["input", "agent_scratchpad"], template=template
+        )
+
+        agent = create_react_agent(
+            llm,
+            tools,
+            prompt,
+        )
+
+        agent_chain = AgentExecutor(
+            agent=agent,
+            tools=tools,
+            verbose=tracing.VERBOSE,
+            handle_parsing_errors=True,
+        )
+
+        # for section_title in section_title_list:
+        #     input_prompt = f"Can you please review the the manuscript located at: '{path}'?\nPlease review the section titled: '{section_title}'"
+        #     agent_chain.invoke(
+        #         {
+        #             "input": input_prompt,
+        #         }
+        #     )
+
+        # the review stages retry on their own, a failed run resumes from the run state when started again
+        with tracing.span("evaluate_paper", mode="agent", path=path):
+            result = agent_chain.invoke(
+                {
+                    "input": initial_input,
+                },
+                config=tracing.traced_config(callbacks),
+            )
+        # the run completed, so there is nothing left to resume
+        clear_run_state()
+        print(resources.get_cache_report())
+        print(question_ranker.get_selection_report())
+    finally:
+        tracing.finish_run()
+    return result
@@ -0,0 +1,109 @@
+import json
+import os
+import threading
+import time
+from datetime import datetime, timezone
+
+from langchain_core.callbacks import BaseCallbackHandler
+
+from tools.json_repair import parse_feedback
+from tools.tools import get_quote_index
+
+REQUIRED_FIELDS = ("Manuscript Text", "Comment")
+REVIEW_FIELDS = REQUIRED_FIELDS + ("Criterion",)
+
+
+def validate_feedback(feedback: list) -> tuple:
+    """
+    The function checks that every $REVIEW blob has a non-empty string for the
+    manuscript text and the comment. It returns the valid blobs, limited to the
+    $REVIEW fields, and a list of the problems found in the others.
+    """
+    valid = []
+    errors = []
+    for position, item in enumerate(feedback):
+        missing = [
+            field for field in REQUIRED_FIELDS
+            if not isinstance(item.get(field), str) or not item[field].strip()
+        ]
+        if missing:
+            errors.append(f"review {position} has no {', '.join(missing)}")
+            continue
+        valid.append({field: str(item[field]) for field in REVIEW_FIELDS if field in item})
+    return valid, errors
+
+
+def make_record(
+    section_title: str, review: str, criteria: list = None, seconds: float = None, quote_index=None
+) -> dict:
+    """
+    The function turns a section review into a streamed record: the section
+    title, the criteria it was reviewed against, its validated {"Feedback": [...]}
+    blobs and its timing. An output without any blob is recorded as an error.
+    With quote_index, the manuscript text of every blob is located in the
+    manuscript and the quotes that are not found are counted.
+    """
+    criteria = criteria or []
+    feedback = parse_feedback(review)
+    for item in feedback:
+        # a review without a criterion is attributed to the aspects it was selected for
+        if criteria:
+            item.setdefault("Criterion", ", ".join(criteria))
+    parsed = bool(feedback)
+    feedback, errors = validate_feedback(feedback)
+    if not parsed:
+        # e.g. the message of a section title that is not in the manuscript
+        errors.append(f"no review found in the output: {review[:200]!r}")
+    missing_quotes = None
+    if quote_index is not None:
+        checks = quote_index.verify([item["Manuscript Text"] for item in feedback])
+        for item, check in zip(feedback, checks):
+            item["Quote Check"] = check
+        missing_quotes = sum(check["Status"] == "missing" for check in checks)
+    return {
+        "Section Title": section_title,
+        "Criteria": criteria,
+        "Feedback": feedback,
+        "Errors": errors,
+        "Missing Quotes": missing_quotes,
+        "Seconds": seconds,
+        "Completed At": datetime.now(timezone.utc).isoformat(),
+    }
+
+
+class JsonlSink:
+    """Appends records to a JSONL file, each one flushed to disk as soon as it is written."""
+
+    def __init__(self, path: str):
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self.path = path
+        self._lock = threading.Lock()
+
+    def write(self, record: dict) -> None:
+        with self._lock, open(self.path, "a") as file:
+            file.write(json.dumps(record) + "\n")
+            file.flush()
+            os.fsync(file.fileno())
+
+
+class ReviewStreamHandler(BaseCallbackHandler):
+    """Writes a record to the sink every time the ReAct agent finishes a section review."""
+
+    def __init__(self, sink: JsonlSink, tool_name: str = "Generate Review"):
+        self.sink = sink
+        self.tool_name = tool_name
+        self._started = {}
+
+    def on_tool_start(self, serialized, input_str, *, run_id, **kwargs):
+        if (serialized or {}).get("name") == self.tool_name:
+            self._started[run_id] = (input_str, time.time())
+
+    def on_tool_end(self, output, *, run_id, **kwargs):
+        if run_id not in self._started:
+            return
+        section_title, started_at = self._started.pop(run_id)
+        self.sink.write(make_record(
+            section_title.strip(), str(output), seconds=time.time() - started_at, quote_index=get_quote_index()
+        ))
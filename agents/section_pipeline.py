@@ -0,0 +1,246 @@
+import asyncio
+import contextvars
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+from langchain_core.prompts.chat import ChatPromptTemplate
+
+from agents.review_stream import JsonlSink, make_record
+from tools import question_ranker, resources, run_state, token_budget, tracing
+from tools.concurrency import MAX_CONCURRENCY, call_with_rate_limit, map_bounded, retry_with_backoff
+from tools.tools import (
+    _fetch_section_content_by_titles,
+    answer_subquestions,
+    clear_run_state,
+    completed_stages,
+    fetch_all_section_titles,
+    get_quote_index,
+    get_run_key,
+    load_path,
+    review_section,
+    select_section_questions,
+    set_path,
+)
+
+# the summaries are kept short so that the context of late sections stays compact
+SUMMARY_MAX_WORDS = 80
+
+
+def summarize_section(section_title: str) -> str:
+    """Returns a short summary of a section, used as context for the later sections."""
+    section_content = _fetch_section_content_by_titles(section_title)
+    if not section_content.strip():
+        return ""
+
+    chat_prompt = ChatPromptTemplate.from_messages(
+        [
+            (
+                "system",
+                "You summarize sections of a software engineering research manuscript for a reviewer. "
+                "Write at most {max_words} words covering the claims, methods and results of the section.",
+            ),
+            ("user", "Section Title: {section_title}\n\nSection Content:\n{section_content}"),
+        ]
+    )
+    chain = chat_prompt | resources.get_summary_llm()
+    with tracing.span("summarize", section_title=section_title):
+        res = call_with_rate_limit(lambda: chain.invoke(
+            {
+                "max_words": SUMMARY_MAX_WORDS,
+                "section_title": section_title,
+                "section_content": token_budget.truncate_to_budget(
+                    section_content, token_budget.SUMMARY_TOKEN_BUDGET
+                ),
+            },
+            config=tracing.traced_config(),
+        ))
+    return res.content
+
+
+def _previous_sections_context(section_titles: list, summaries: list, index: int) -> str:
+    # the summaries closest to the section are kept, the earliest ones are dropped once
+    # CONTEXT_TOKEN_BUDGET is full, and the kept ones stay in manuscript order
+    lines = []
+    remaining = token_budget.CONTEXT_TOKEN_BUDGET
+    for title, summary in reversed(list(zip(section_titles[:index], summaries[:index]))):
+        if not summary:
+            continue
+        line = f"{title}: {summary}"
+        tokens = token_budget.count_tokens(line) + 1
+        if tokens > remaining:
+            if not lines:
+                lines.append(token_budget.truncate_to_budget(line, remaining))
+            break
+        lines.append(line)
+        remaining -= tokens
+    return "\n".join(reversed(lines))
+
+
+def prefetch_definitions(section_titles: list, max_workers: int = None) -> None:
+    """
+    The function selects the questions of every section, then answers the
+    subquestions of all sections together, so each distinct subquestion is
+    retrieved and answered once per manuscript rather than once per section.
+    Sections whose definitions were stored by an earlier run are skipped.
+    """
+    completed = completed_stages()
+    section_titles = [
+        section_title for section_title in section_titles
+        if not {"definitions", "review"} & set(completed.get(section_title, []))
+    ]
+    selections = map_bounded(select_section_questions, section_titles, max_workers)
+    subquestions = [
+        subquestion
+        for question_dict in selections
+        for questions in question_dict.values()
+        for q in questions
+        for subquestion in q["Subquestions"]
+    ]
+    retry_with_backoff(lambda: answer_subquestions(subquestions))
+
+
+def iter_section_reviews(section_titles: list, max_workers: int = None):
+    """
+    The function reviews all sections in parallel and yields (section_title, review)
+    pairs in the order the reviews complete. The previous sections are passed to
+    each review as precomputed summaries, so no section waits for another one.
+    Only the sections before the last one still to be reviewed are summarized,
+    and the summaries are stored in the run state like the other stages.
+    """
+    completed = completed_stages()
+    pending = [
+        index for index, section_title in enumerate(section_titles)
+        if "review" not in completed.get(section_title, [])
+    ]
+    summarized = section_titles[:pending[-1]] if pending else []
+    summaries = map_bounded(
+        lambda section_title: run_state.run_stage(
+            get_run_key(), section_title, "summary", lambda: summarize_section(section_title)
+        ),
+        summarized,
+        max_workers,
+    )
+    prefetch_definitions(section_titles, max_workers)
+
+    with ThreadPoolExecutor(max_workers=max_workers or MAX_CONCURRENCY) as executor:
+        futures = {
+            executor.submit(
+                contextvars.copy_context().run,
+                review_section,
+                section_title,
+                _previous_sections_context(section_titles, summaries, index),
+            ): section_title
+            for index, section_title in enumerate(section_titles)
+        }
+        for future in as_completed(futures):
+            yield futures[future], future.result()
+
+
+def aggregate_feedback(records: list) -> dict:
+    """
+    The function merges the section records into one result. records is a list
+    of make_record results in manuscript order.
+    """
+    return {
+        "Sections": [
+            {"Section Title": record["Section Title"], "Feedback": record["Feedback"]}
+            for record in records
+        ]
+    }
+
+
+def prepare_manuscript(manuscript_path: str = None) -> list:
+    """
+    Makes manuscript_path (or the path in tools/current_path.txt) the manuscript
+    under review and returns its section titles. Duplicated titles are reviewed
+    once, so they are only returned once.
+    """
+    if manuscript_path is None:
+        load_path()
+    else:
+        set_path(manuscript_path)
+    section_titles = list(dict.fromkeys(fetch_all_section_titles()))
+    reviewed = [title for title, stages in completed_stages().items() if "review" in stages]
+    if reviewed:
+        print(f"Resuming: {len(reviewed)} of {len(section_titles)} sections were reviewed by an earlier run.")
+    return section_titles
+
+
+def iter_review_records(manuscript_path: str = None, max_workers: int = None, sink: JsonlSink = None):
+    """
+    The function reviews a manuscript and yields one validated record per section
+    as soon as the section review completes. Each record is also appended to sink
+    when one is given, so finished sections survive a crash. The run state is
+    cleared once every record has been yielded.
+    """
+    yield from iter_section_records(prepare_manuscript(manuscript_path), max_workers, sink)
+    # the run completed, so there is nothing left to resume
+    clear_run_state()
+
+
+def iter_section_records(section_titles: list, max_workers: int = None, sink: JsonlSink = None):
+    """Yields the records of the given sections of the current manuscript as they complete."""
+    with tracing.span("load_resources"):
+        resources.warm_up()
+    print(resources.get_load_report())
+
+    for section_title, result in iter_section_reviews(section_titles, max_workers):
+        with tracing.span("verify_quotes", section_title=section_title):
+            record = make_record(
+                section_title, result["review"], result["criteria"], result["seconds"], get_quote_index()
+            )
+        if sink is not None:
+            sink.write(record)
+        yield record
+
+
+async def aiter_review_records(manuscript_path: str = None, max_workers: int = None, sink: JsonlSink = None):
+    """The async iterator version of iter_review_records, for asyncio consumers."""
+    loop = asyncio.get_running_loop()
+    queue = asyncio.Queue()
+    done = object()
+
+    def produce():
+        try:
+            for record in iter_review_records(manuscript_path, max_workers, sink):
+                loop.call_soon_threadsafe(queue.put_nowait, record)
+        except Exception as error:
+            loop.call_soon_threadsafe(queue.put_nowait, error)
+        finally:
+            loop.call_soon_threadsafe(queue.put_nowait, done)
+
+    context = contextvars.copy_context()
+    producer = loop.run_in_executor(None, context.run, produce)
+    while True:
+        item = await queue.get()
+        if item is done:
+            break
+        if isinstance(item, Exception):
+            raise item
+        yield item
+    await producer
+
+
+def evaluate_paper_pipeline(manuscript_path: str = None, max_workers: int = None, stream_path: str = None) -> dict:
+    """
+    Reviews a manuscript without the ReAct agent. All sections are reviewed in
+    parallel, so the time per paper depends on the slowest section rather than on
+    the sum of all sections, and the section reviews are merged at the end. With
+    stream_path, every section record is appended to that JSONL file as it completes.
+    """
+    sink = JsonlSink(stream_path) if stream_path else None
+    tracing.start_run("pipeline")
+    try:
+        with tracing.span("evaluate_paper", mode="pipeline"):
+            section_titles = prepare_manuscript(manuscript_path)
+            records = {
+                record["Section Title"]: record
+                for record in iter_section_records(section_titles, max_workers, sink)
+            }
+            result = aggregate_feedback([records[title] for title in section_titles])
+        # the run completed, so there is nothing left to resume
+        clear_run_state()
+        print(resources.get_cache_report())
+        print(question_ranker.get_selection_report())
+    finally:
+        tracing.finish_run()
+    return result
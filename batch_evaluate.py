@@ -0,0 +1,130 @@
+import argparse
+import hashlib
+import json
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+from dotenv import load_dotenv
+
+BATCH_CHECKPOINT_PATH = "batch_checkpoint.jsonl"
+SECTION_CHECKPOINT_DIRECTORY = "batch_checkpoints"
+
+
+def _append_record(checkpoint_path: str, record: dict) -> None:
+    with open(checkpoint_path, "a") as file:
+        file.write(json.dumps(record) + "\n")
+        file.flush()
+        os.fsync(file.fileno())
+
+
+def _read_records(checkpoint_path: str) -> list:
+    records = []
+    if not os.path.isfile(checkpoint_path):
+        return records
+    with open(checkpoint_path, "r") as file:
+        for line in file:
+            try:
+                records.append(json.loads(line))
+            except ValueError:
+                # a record cut short by an interruption
+                continue
+    return records
+
+
+def section_checkpoint_path(manuscript_path: str) -> str:
+    """Returns the checkpoint file holding the section reviews of one manuscript."""
+    key = hashlib.sha256(os.path.abspath(manuscript_path).encode("utf-8")).hexdigest()[:16]
+    stem = os.path.splitext(os.path.basename(manuscript_path))[0]
+    return os.path.join(SECTION_CHECKPOINT_DIRECTORY, f"{stem}-{key}.jsonl")
+
+
+def list_manuscripts(source: str) -> list:
+    """
+    Returns the manuscripts of a batch. source is either a directory of PDFs or a
+    manifest file listing one PDF path per line (or a JSON list of paths).
+    """
+    if os.path.isdir(source):
+        return [
+            os.path.join(source, filename)
+            for filename in sorted(os.listdir(source))
+            if filename.endswith(".pdf")
+        ]
+
+    with open(source, "r") as file:
+        text = file.read()
+    if source.endswith(".json"):
+        return json.loads(text)
+    return [line.strip() for line in text.splitlines() if line.strip()]
+
+
+def completed_manuscripts(checkpoint_path: str = BATCH_CHECKPOINT_PATH) -> set:
+    """Returns the manuscripts that already have a finished review in the checkpoint."""
+    return {
+        record["paper"]
+        for record in _read_records(checkpoint_path)
+        if record.get("status") == "done"
+    }
+
+
+def _evaluate_one(manuscript_path: str) -> dict:
+    """
+    Runs in a worker process. Every call resets the manuscript state of the worker.
+    The sections an interrupted run already reviewed are read back from the run
+    state, so only the remaining sections are reviewed again.
+    """
+    from agents.paper_evaluate_agent import evaluate_paper
+    from agents.review_stream import JsonlSink, ReviewStreamHandler
+    from tools import pdf_extract
+
+    load_dotenv()
+    # the papers are already spread over the processes, so each one extracts its pages alone
+    pdf_extract.EXTRACT_WORKERS = 1
+    checkpoint_path = section_checkpoint_path(manuscript_path)
+    # resumed sections are written again, so the file holds one record per section
+    if os.path.exists(checkpoint_path):
+        os.remove(checkpoint_path)
+    start = time.time()
+    result = evaluate_paper(
+        manuscript_path,
+        callbacks=[ReviewStreamHandler(JsonlSink(checkpoint_path))],
+    )
+    return {
+        "paper": manuscript_path,
+        "status": "done",
+        "output": result["output"],
+        "seconds": time.time() - start,
+    }
+
+
+def batch_evaluate(manuscripts: list, max_workers: int = 4, checkpoint_path: str = BATCH_CHECKPOINT_PATH) -> None:
+    """
+    Reviews many manuscripts across a process pool. A checkpoint record is written
+    after every finished paper, and papers already finished in the checkpoint are
+    skipped, so an interrupted batch resumes where it stopped.
+    """
+    done = completed_manuscripts(checkpoint_path)
+    pending = [manuscript for manuscript in manuscripts if manuscript not in done]
+    print(f"{len(done)} manuscripts already reviewed, {len(pending)} to go.")
+
+    with ProcessPoolExecutor(max_workers=max_workers) as executor:
+        futures = {executor.submit(_evaluate_one, manuscript): manuscript for manuscript in pending}
+        for future in as_completed(futures):
+            manuscript = futures[future]
+            try:
+                record = future.result()
+            except Exception as error:
+                record = {"paper": manuscript, "status": "failed", "error": repr(error)}
+            _append_record(checkpoint_path, record)
+            print(f"{record['status']}: {manuscript}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Review a batch of manuscripts.")
+    parser.add_argument("source", help="a directory of PDFs or a manifest file of PDF paths")
+    parser.add_argument("--workers", type=int, default=4, help="number of worker processes")
+    parser.add_argument("--checkpoint", default=BATCH_CHECKPOINT_PATH, help="the batch checkpoint file")
+    args = parser.parse_args()
+
+    load_dotenv()
+    batch_evaluate(list_manuscripts(args.source), args.workers, args.checkpoint)
@@ -0,0 +1,105 @@
+import hashlib
+import json
+import re
+import time
+from typing import Any, List, Optional
+
+import numpy as np
+from langchain_core.embeddings import Embeddings
+from langchain_core.language_models.chat_models import SimpleChatModel
+from langchain_core.language_models.llms import LLM
+
+from tools import resources
+
+
+class FakeOpenAI(LLM):
+    """A stand-in for OpenAI completions that answers after a fixed latency."""
+
+    latency: float = 0.0
+
+    @property
+    def _llm_type(self) -> str:
+        return "fake-openai"
+
+    def _call(self, prompt: str, stop: Optional[List[str]] = None, run_manager=None, **kwargs: Any) -> str:
+        time.sleep(self.latency)
+        return "A criterion is satisfied when the manuscript states it explicitly and supports it with evidence."
+
+
+class FakeChatOpenAI(SimpleChatModel):
+    """
+    A stand-in for ChatOpenAI that answers the prompts of this project after a
+    fixed latency: question selection returns checklist questions, summaries
+    return a sentence and reviews quote the first sentence of the section.
+    """
+
+    latency: float = 0.0
+    checklist: dict = {}
+
+    @property
+    def _llm_type(self) -> str:
+        return "fake-chat-openai"
+
+    def _call(self, messages, stop: Optional[List[str]] = None, run_manager=None, **kwargs: Any) -> str:
+        time.sleep(self.latency)
+        system = messages[0].content
+        user = messages[-1].content
+
+        if "quality checklist" in system:
+            selected = {}
+            for aspect, questions in self.checklist.items():
+                if len(selected) < 4:
+                    selected[aspect] = questions[:1]
+            return json.dumps(selected)
+        if "summarize" in system:
+            return "The section describes the study and its results."
+
+        quotes = re.findall(r"[A-Z][^.\n]*\.", user)
+        feedback = [
+            {"Manuscript Text": quote, "Comment": "Please make this statement more specific."}
+            for quote in quotes[:3]
+        ]
+        return json.dumps({"Feedback": feedback})
+
+
+class FakeOpenAIEmbeddings(Embeddings):
+    """Deterministic hash-based embeddings that answer after a fixed latency per request."""
+
+    def __init__(self, size: int = 256, latency: float = 0.0):
+        self.size = size
+        self.latency = latency
+        self.model = "fake-embeddings"
+
+    def _embed(self, text: str) -> List[float]:
+        seed = int.from_bytes(hashlib.sha256(text.encode("utf-8")).digest()[:4], "little")
+        vector = np.random.default_rng(seed).standard_normal(self.size)
+        return (vector / np.linalg.norm(vector)).tolist()
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        time.sleep(self.latency)
+        return [self._embed(text) for text in texts]
+
+    def embed_query(self, text: str) -> List[float]:
+        time.sleep(self.latency)
+        return self._embed(text)
+
+
+def install_fakes(latency: float = 0.0, criteria_texts: list = None) -> None:
+    """
+    Replaces the models, embeddings and criteria store of the resource pool with
+    offline stand-ins, so the pipeline runs without network access.
+    """
+    from langchain_community.vectorstores import FAISS
+
+    resources.reset()
+    embeddings = FakeOpenAIEmbeddings(latency=latency)
+    criteria_texts = criteria_texts or [
+        f"Criterion {number}: a good manuscript states its contribution and validates it."
+        for number in range(200)
+    ]
+    resources.override("embeddings", embeddings)
+    resources.override("vectorstore", FAISS.from_texts(criteria_texts, embeddings))
+    resources.override("instruct_llm", FakeOpenAI(latency=latency))
+    resources.override("chat_llm", FakeChatOpenAI(latency=latency, checklist=resources.get_checklist()))
+    resources.override("summary_llm", FakeChatOpenAI(latency=latency))
+    resources.override("criteria_answers", {})
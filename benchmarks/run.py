@@ -0,0 +1,221 @@
+"""
+Offline benchmarks of the evaluation pipeline on synthetic manuscripts.
+
+Usage:
+    python -m benchmarks.run --output bench.json
+    python -m benchmarks.run --baseline bench.json --tolerance 0.25
+"""
+import argparse
+import json
+import os
+import platform
+import shutil
+import sys
+import tempfile
+import time
+
+from benchmarks import synthetic
+from benchmarks.fakes import FakeOpenAIEmbeddings, install_fakes
+from tools import concurrency, llm_cache, parse_cache, run_state
+from tools import tools as review_tools
+
+DEFAULT_SCENARIOS = [(10, 5), (60, 20), (150, 40), (300, 80)]
+
+
+def _timed(func, repeat: int) -> dict:
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        timings.append(time.perf_counter() - start)
+    return {"seconds": min(timings), "mean_seconds": sum(timings) / len(timings), "repeat": repeat}
+
+
+def _result(name: str, params: dict, timing: dict) -> dict:
+    result = {"name": name, "params": params}
+    result.update(timing)
+    print(f"{name:<32}{json.dumps(params):<40}{timing['seconds']:>10.4f}s")
+    return result
+
+
+def bench_manuscript(work_directory: str, num_pages: int, num_sections: int, repeat: int, reviewed_sections: int) -> list:
+    params = {"pages": num_pages, "sections": num_sections}
+    manuscript_path = os.path.join(work_directory, f"manuscript-{num_pages}-{num_sections}.pdf")
+    parsed = synthetic.generate_manuscript(manuscript_path, num_pages, num_sections)
+    # papermage needs its models, so the parse result is served from the parse cache
+    parse_cache._write_cache(parse_cache.cache_key(manuscript_path), parsed)
+
+    def fetch_titles():
+        parse_cache._parsed_documents.clear()
+        review_tools.set_path(manuscript_path)
+        review_tools.fetch_all_section_titles()
+
+    def fetch_contents():
+        review_tools.set_path(manuscript_path)
+        review_tools.fetch_all_section_titles()
+        for section_title in review_tools.section_title_list:
+            review_tools._fetch_section_content_by_titles(section_title)
+
+    def generate_reviews():
+        # every run selects and answers the questions again instead of reusing the previous run's
+        review_tools.question_selections.clear()
+        review_tools.subquestion_answers.clear()
+        for section_title in review_tools.section_title_list[:reviewed_sections]:
+            review_tools.review_section(section_title)
+
+    results = [
+        _result("fetch_all_section_titles", params, _timed(fetch_titles, repeat)),
+        _result("fetch_section_contents", params, _timed(fetch_contents, repeat)),
+    ]
+    review_params = dict(params, reviewed_sections=min(reviewed_sections, num_sections))
+    results.append(_result("generate_review", review_params, _timed(generate_reviews, repeat)))
+    return results
+
+
+def bench_criteria_indexing(work_directory: str, num_papers: int, latency: float) -> list:
+    from langchain_community.vectorstores import FAISS
+
+    from save_and_index_criteria import save_and_index_papers
+    from tools.vector_store import MmapVectorStore
+
+    papers_directory = os.path.join(work_directory, "criteria papers")
+    index_directory = os.path.join(work_directory, "criteria index")
+    mmap_directory = os.path.join(work_directory, "criteria index mmap")
+    os.makedirs(papers_directory, exist_ok=True)
+    for number in range(num_papers):
+        synthetic.generate_manuscript(
+            os.path.join(papers_directory, f"criteria-{number}.pdf"), 4, 3, seed=number
+        )
+
+    embeddings = FakeOpenAIEmbeddings(latency=latency)
+    params = {"papers": num_papers}
+    return [
+        _result(
+            "criteria_indexing_full",
+            params,
+            _timed(lambda: save_and_index_papers(papers_directory, index_directory, embeddings, mmap_directory), 1),
+        ),
+        _result(
+            "criteria_indexing_unchanged",
+            params,
+            _timed(lambda: save_and_index_papers(papers_directory, index_directory, embeddings, mmap_directory), 1),
+        ),
+        _result(
+            "criteria_store_load_faiss",
+            params,
+            _timed(lambda: FAISS.load_local(index_directory, embeddings, allow_dangerous_deserialization=True), 3),
+        ),
+        _result(
+            "criteria_store_load_mmap",
+            params,
+            _timed(lambda: MmapVectorStore(mmap_directory, embeddings), 3),
+        ),
+    ]
+
+
+def bench_openreview_lookup(work_directory: str, num_submissions: int, repeat: int) -> list:
+    from tools.openreview_index import OpenReviewIndex, build_openreview_index
+
+    data_path = os.path.join(work_directory, "correct_file.json")
+    index_directory = os.path.join(work_directory, "openreview_index")
+    synthetic.generate_openreview_data(data_path, num_submissions)
+    params = {"submissions": num_submissions}
+    results = [
+        _result("openreview_index_build", params, _timed(lambda: build_openreview_index(data_path, index_directory), 1))
+    ]
+
+    query = "empirical study of software testing tools and developers"
+
+    def lookup():
+        index = OpenReviewIndex(index_directory)
+        for submission_id in index.search(query):
+            index.get_reviews(submission_id)
+
+    results.append(_result("openreview_lookup", params, _timed(lookup, repeat)))
+    return results
+
+
+def compare_with_baseline(results: list, baseline_path: str, tolerance: float) -> list:
+    """Returns the results that are slower than the baseline by more than tolerance."""
+    with open(baseline_path, "r") as file:
+        baseline = {
+            (result["name"], json.dumps(result["params"], sort_keys=True)): result
+            for result in json.load(file)["results"]
+        }
+
+    regressions = []
+    for result in results:
+        previous = baseline.get((result["name"], json.dumps(result["params"], sort_keys=True)))
+        if previous is None:
+            continue
+        ratio = result["seconds"] / max(previous["seconds"], 1e-9)
+        result["baseline_seconds"] = previous["seconds"]
+        result["ratio"] = ratio
+        if ratio > 1 + tolerance:
+            regressions.append(result)
+    return regressions
+
+
+def main(argv: list = None) -> int:
+    parser = argparse.ArgumentParser(description="Run the offline benchmarks.")
+    parser.add_argument("--scenario", action="append", metavar="PAGES:SECTIONS",
+                        help="a synthetic manuscript size, can be repeated")
+    parser.add_argument("--latency", type=float, default=0.0, help="seconds of latency per fake model call")
+    parser.add_argument("--requests-per-second", type=float, default=0.0,
+                        help="rate limit of the fake model calls, 0 disables it")
+    parser.add_argument("--repeat", type=int, default=3, help="runs per measurement, the fastest is reported")
+    parser.add_argument("--reviewed-sections", type=int, default=3, help="sections reviewed per manuscript")
+    parser.add_argument("--criteria-papers", type=int, default=5, help="synthetic criteria papers to index")
+    parser.add_argument("--submissions", type=int, default=5000, help="synthetic OpenReview submissions")
+    parser.add_argument("--output", help="write the results as JSON to this file")
+    parser.add_argument("--baseline", help="compare against the results in this file")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="allowed slowdown against the baseline")
+    args = parser.parse_args(argv)
+
+    scenarios = DEFAULT_SCENARIOS
+    if args.scenario:
+        scenarios = [tuple(int(value) for value in scenario.split(":")) for scenario in args.scenario]
+
+    work_directory = tempfile.mkdtemp(prefix="se-eval-bench-")
+    # the benchmarks measure the work itself, not the persistent caches
+    llm_cache.LLM_CACHE_ENABLED = False
+    run_state.RUN_STATE_ENABLED = False
+    parse_cache.PARSE_CACHE_DIRECTORY = os.path.join(work_directory, "parse_cache")
+    concurrency._default_rate_limiter = concurrency.TokenBucket(args.requests_per_second)
+    install_fakes(args.latency)
+
+    results = []
+    try:
+        for num_pages, num_sections in scenarios:
+            results.extend(
+                bench_manuscript(work_directory, num_pages, num_sections, args.repeat, args.reviewed_sections)
+            )
+        results.extend(bench_criteria_indexing(work_directory, args.criteria_papers, args.latency))
+        results.extend(bench_openreview_lookup(work_directory, args.submissions, args.repeat))
+    finally:
+        shutil.rmtree(work_directory, ignore_errors=True)
+
+    regressions = []
+    if args.baseline:
+        regressions = compare_with_baseline(results, args.baseline, args.tolerance)
+        for result in regressions:
+            print(f"REGRESSION {result['name']} {json.dumps(result['params'])}: "
+                  f"{result['baseline_seconds']:.4f}s -> {result['seconds']:.4f}s")
+
+    if args.output:
+        with open(args.output, "w") as file:
+            json.dump(
+                {
+                    "python": platform.python_version(),
+                    "platform": platform.platform(),
+                    "latency": args.latency,
+                    "results": results,
+                },
+                file,
+                indent=4,
+            )
+    return 1 if regressions else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,104 @@
+import json
+import random
+
+WORDS = (
+    "software engineering research study developers results method evaluation "
+    "validation question approach tool data analysis empirical code quality "
+    "maintenance testing framework performance repository survey participants "
+    "threats model technique metric defect project industrial case experiment"
+).split()
+
+PAGE_WIDTH = 612
+PAGE_HEIGHT = 792
+LINES_PER_PAGE = 46
+LINE_HEIGHT = 15
+
+
+def _sentence(rng: random.Random) -> str:
+    words = rng.choices(WORDS, k=rng.randint(8, 14))
+    return " ".join(words).capitalize() + "."
+
+
+def _escape(text: str) -> str:
+    return text.replace("\\", "\\\\").replace("(", "\\(").replace(")", "\\)")
+
+
+def write_pdf(path: str, pages: list) -> None:
+    """Writes a minimal PDF where every page is a list of text lines."""
+    objects = [
+        "<< /Type /Catalog /Pages 2 0 R >>",
+        None,  # the page tree is filled in once the page ids are known
+        "<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>",
+    ]
+    page_ids = []
+    for lines in pages:
+        stream = [f"BT /F1 10 Tf {LINE_HEIGHT} TL 72 {PAGE_HEIGHT - 72} Td"]
+        for line in lines:
+            stream.append(f"({_escape(line)}) Tj T*")
+        stream.append("ET")
+        content = "\n".join(stream)
+        objects.append(f"<< /Length {len(content.encode('latin-1'))} >>\nstream\n{content}\nendstream")
+        content_id = len(objects)
+        objects.append(
+            f"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 {PAGE_WIDTH} {PAGE_HEIGHT}] "
+            f"/Resources << /Font << /F1 3 0 R >> >> /Contents {content_id} 0 R >>"
+        )
+        page_ids.append(len(objects))
+    kids = " ".join(f"{page_id} 0 R" for page_id in page_ids)
+    objects[1] = f"<< /Type /Pages /Kids [{kids}] /Count {len(page_ids)} >>"
+
+    output = bytearray(b"%PDF-1.4\n")
+    offsets = []
+    for number, body in enumerate(objects, start=1):
+        offsets.append(len(output))
+        output += f"{number} 0 obj\n{body}\nendobj\n".encode("latin-1")
+    xref_offset = len(output)
+    output += f"xref\n0 {len(objects) + 1}\n0000000000 65535 f \n".encode("latin-1")
+    for offset in offsets:
+        output += f"{offset:010d} 00000 n \n".encode("latin-1")
+    output += (
+        f"trailer\n<< /Size {len(objects) + 1} /Root 1 0 R >>\nstartxref\n{xref_offset}\n%%EOF\n"
+    ).encode("latin-1")
+
+    with open(path, "wb") as file:
+        file.write(output)
+
+
+def generate_manuscript(path: str, num_pages: int, num_sections: int, seed: int = 0) -> dict:
+    """
+    The function writes a synthetic manuscript PDF and returns what the papermage
+    CoreRecipe would have found in it: the section titles, title and abstract.
+    """
+    rng = random.Random(seed)
+    total_lines = num_pages * LINES_PER_PAGE
+    title = "A Synthetic Study of " + " ".join(rng.choices(WORDS, k=4)).title()
+    abstract = " ".join(_sentence(rng) for _ in range(4))
+    section_titles = [
+        f"{number} {' '.join(rng.choices(WORDS, k=2)).title()}"
+        for number in range(1, num_sections + 1)
+    ]
+
+    lines = [title, "Abstract"]
+    body_lines = max(1, (total_lines - len(lines)) // num_sections - 1)
+    for section_title in section_titles:
+        lines.append(section_title)
+        lines.extend(_sentence(rng) for _ in range(body_lines))
+
+    pages = [lines[start:start + LINES_PER_PAGE] for start in range(0, len(lines), LINES_PER_PAGE)]
+    write_pdf(path, pages)
+    return {"sections": section_titles, "titles": [title], "abstracts": [abstract]}
+
+
+def generate_openreview_data(path: str, num_submissions: int, seed: int = 0) -> None:
+    """Writes a synthetic OpenReview submissions file in the layout of correct_file.json."""
+    rng = random.Random(seed)
+    submissions = []
+    for number in range(num_submissions):
+        version = {
+            "title": f"Submission {number}",
+            "abstract": " ".join(_sentence(rng) for _ in range(rng.randint(3, 8))),
+            "reviews": [_sentence(rng) for _ in range(rng.randint(1, 4))],
+        }
+        submissions.append({"article_versions": {"0": version}})
+    with open(path, "w") as file:
+        json.dump({"orb_submissions": submissions}, file)
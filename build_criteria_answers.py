@@ -0,0 +1,8 @@
+from dotenv import load_dotenv
+from tools.criteria_answers import build_criteria_answers, CRITERIA_ANSWERS_PATH
+
+
+if __name__ == "__main__":
+    load_dotenv()
+    answers = build_criteria_answers()
+    print(f"Answered {len(answers)} checklist subquestions and saved them to {CRITERIA_ANSWERS_PATH}.")
@@ -0,0 +1,10 @@
+from tools.openreview_index import (
+    build_openreview_index,
+    OPENREVIEW_DATA_PATH,
+    OPENREVIEW_INDEX_DIRECTORY,
+)
+
+
+if __name__ == "__main__":
+    num_docs = build_openreview_index()
+    print(f"Indexed {num_docs} submissions from {OPENREVIEW_DATA_PATH} into {OPENREVIEW_INDEX_DIRECTORY}.")
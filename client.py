@@ -0,0 +1,39 @@
+import argparse
+import json
+import sys
+import urllib.request
+
+from server import DEFAULT_HOST, DEFAULT_PORT
+
+
+def evaluate(manuscript_path: str, host: str = DEFAULT_HOST, port: int = DEFAULT_PORT):
+    """Sends a review job to the running service and yields its records as they arrive."""
+    request = urllib.request.Request(
+        f"http://{host}:{port}/evaluate",
+        data=json.dumps({"path": manuscript_path}).encode("utf-8"),
+        headers={"Content-Type": "application/json"},
+        method="POST",
+    )
+    with urllib.request.urlopen(request) as response:
+        for line in response:
+            if line.strip():
+                yield json.loads(line)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Review a manuscript with the running service.")
+    parser.add_argument("path", nargs="?", help="the manuscript, defaults to tools/current_path.txt")
+    parser.add_argument("--host", default=DEFAULT_HOST)
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT)
+    args = parser.parse_args()
+
+    manuscript_path = args.path
+    if manuscript_path is None:
+        with open("tools/current_path.txt", "r") as f:
+            manuscript_path = f.read()
+
+    failed = False
+    for record in evaluate(manuscript_path, args.host, args.port):
+        print(json.dumps(record, indent=4), flush=True)
+        failed = failed or "error" in record
+    sys.exit(1 if failed else 0)
@@ -0,0 +1,17 @@
+from dotenv import load_dotenv
+from langchain_community.vectorstores import FAISS
+
+from tools import resources
+from tools.vector_store import MMAP_INDEX_DIRECTORY, export_vectorstore
+
+
+if __name__ == "__main__":
+    load_dotenv()
+    # the pickled store is loaded one last time to write the memory-mapped export
+    vectorstore = FAISS.load_local(
+        resources.CRITERIA_INDEX_DIRECTORY,
+        resources.get_embeddings(),
+        allow_dangerous_deserialization=True,
+    )
+    count = export_vectorstore(vectorstore, MMAP_INDEX_DIRECTORY, resources.CRITERIA_INDEX_DIRECTORY)
+    print(f"Exported {count} vectors from {resources.CRITERIA_INDEX_DIRECTORY} into {MMAP_INDEX_DIRECTORY}.")
@@ -1,6 +1,40 @@
-from agents.paper_evaluate_agent import evaluate_paper
+import argparse
+import json
 from dotenv import load_dotenv
 
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Review the manuscript in tools/current_path.txt.")
+    parser.add_argument(
+        "--pipeline",
+        action="store_true",
+        help="review all sections in parallel instead of running the ReAct agent",
+    )
+    parser.add_argument(
+        "--stream",
+        metavar="PATH",
+        help="append each section review to this JSONL file as soon as it completes",
+    )
+    parser.add_argument(
+        "--fresh",
+        action="store_true",
+        help="discard the completed stages of an earlier run of this manuscript instead of resuming it",
+    )
+    args = parser.parse_args()
+
     load_dotenv()
-    evaluate_paper()
\ No newline at end of file
+    if args.fresh:
+        from tools.tools import clear_run_state, load_path
+
+        load_path()
+        clear_run_state()
+    # only the selected mode is imported, so the CLI starts quickly
+    if args.pipeline:
+        from agents.section_pipeline import evaluate_paper_pipeline
+
+        print(json.dumps(evaluate_paper_pipeline(stream_path=args.stream), indent=4))
+    else:
+        from agents.paper_evaluate_agent import evaluate_paper
+        from agents.review_stream import JsonlSink, ReviewStreamHandler
+
+        callbacks = [ReviewStreamHandler(JsonlSink(args.stream))] if args.stream else None
+        evaluate_paper(callbacks=callbacks)
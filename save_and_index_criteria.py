@@ -1,31 +1,137 @@
+import json
 import os
-import time
+import uuid
 from langchain_experimental.text_splitter import SemanticChunker
 from langchain_openai import OpenAIEmbeddings
 from langchain_community.vectorstores import FAISS
 from langchain_community.document_loaders import PyPDFLoader
+from tools.concurrency import AdaptiveRateLimiter, call_with_rate_limit
+from tools.hashing import file_digest
+from tools.llm_cache import cached_embeddings, install_llm_cache
+from tools.vector_store import MMAP_INDEX_DIRECTORY, export_vectorstore
 
 CRITERIA_PAPERS_DIRECTORY = "/Users/crystalalice/Desktop/ICSHP_Research/criteria papers"
+CRITERIA_INDEX_DIRECTORY = "faiss_index_full_criteria"
+MANIFEST_FILENAME = "manifest.json"
+EMBEDDING_BATCH_SIZE = 64
 
 
-def save_and_index_papers():
-    embeddings = OpenAIEmbeddings()
-    all_docs = []
+def load_manifest(index_directory: str = CRITERIA_INDEX_DIRECTORY) -> dict:
+    """
+    Loads the manifest of the indexed criteria papers. Each PDF filename maps to
+    its content hash and the ids of its chunks in the vector store.
+    """
+    try:
+        with open(os.path.join(index_directory, MANIFEST_FILENAME), "r") as file:
+            return json.load(file)
+    except (OSError, ValueError):
+        return {}
 
-    for filename in os.listdir(CRITERIA_PAPERS_DIRECTORY):
+
+def _save_manifest(manifest: dict, index_directory: str) -> None:
+    with open(os.path.join(index_directory, MANIFEST_FILENAME), "w") as file:
+        json.dump(manifest, file, indent=4)
+
+
+def _load_vectorstore(embeddings, index_directory: str):
+    if not os.path.isfile(os.path.join(index_directory, "index.faiss")):
+        return None
+    return FAISS.load_local(
+        index_directory,
+        embeddings,
+        allow_dangerous_deserialization=True,
+    )
+
+
+def _embed_in_batches(embeddings, texts: list, rate_limiter: AdaptiveRateLimiter) -> list:
+    vectors = []
+    for start in range(0, len(texts), EMBEDDING_BATCH_SIZE):
+        batch = texts[start:start + EMBEDDING_BATCH_SIZE]
+        vectors.extend(
+            call_with_rate_limit(lambda: embeddings.embed_documents(batch), rate_limiter)
+        )
+    return vectors
+
+
+def save_and_index_papers(
+    papers_directory: str = CRITERIA_PAPERS_DIRECTORY,
+    index_directory: str = CRITERIA_INDEX_DIRECTORY,
+    embeddings=None,
+    mmap_directory: str = MMAP_INDEX_DIRECTORY,
+):
+    """
+    Indexes the criteria papers into the FAISS store. Only new or changed PDFs are
+    chunked and embedded, and their chunks replace the old ones in the existing
+    store. Chunk embeddings are cached, so unchanged chunks are never embedded twice.
+    embeddings defaults to the OpenAI embeddings client. The store is also exported
+    to mmap_directory in the memory-mapped format, unless mmap_directory is None.
+    """
+    install_llm_cache()
+    embeddings = cached_embeddings(embeddings or OpenAIEmbeddings(show_progress_bar=True))
+    text_splitter = SemanticChunker(embeddings)
+    rate_limiter = AdaptiveRateLimiter()
+
+    vectorstore = _load_vectorstore(embeddings, index_directory)
+    if vectorstore is not None and not os.path.isfile(os.path.join(index_directory, MANIFEST_FILENAME)):
+        # a store built before the manifest existed cannot tell which papers it holds,
+        # so it is rebuilt; the chunk embeddings come from the cache
+        print(f"{index_directory} has no {MANIFEST_FILENAME}, rebuilding the index from scratch")
+        vectorstore = None
+    # without an existing store there is nothing to update incrementally
+    manifest = load_manifest(index_directory) if vectorstore is not None else {}
+
+    digests = {}
+    for filename in sorted(os.listdir(papers_directory)):
         if filename.endswith(".pdf"):
-            pdf_path = os.path.join(CRITERIA_PAPERS_DIRECTORY, filename)
-            loader = PyPDFLoader(file_path=pdf_path)
-            documents = loader.load()
-            text_splitter = SemanticChunker(OpenAIEmbeddings(show_progress_bar=True))
-            docs = text_splitter.split_documents(documents=documents)
-            for doc in docs:
-                all_docs.append(doc)
-                print("added doc")
-                time.sleep(2)
-
-    vectorstore = FAISS.from_documents(all_docs, embeddings)
-    vectorstore.save_local("faiss_index_full_criteria")
+            digests[filename] = file_digest(os.path.join(papers_directory, filename))
+
+    stale_ids = []
+    for filename, entry in list(manifest.items()):
+        if digests.get(filename) != entry["sha256"]:
+            stale_ids.extend(entry["ids"])
+            del manifest[filename]
+    if stale_ids:
+        vectorstore.delete(stale_ids)
+        print(f"removed {len(stale_ids)} chunks of changed or deleted papers")
+
+    for filename, digest in digests.items():
+        if filename in manifest:
+            continue
+
+        loader = PyPDFLoader(file_path=os.path.join(papers_directory, filename))
+        documents = loader.load()
+        docs = call_with_rate_limit(
+            lambda: text_splitter.split_documents(documents=documents), rate_limiter
+        )
+        if not docs:
+            # a PDF without text yields no chunks, it is recorded so that it is not read again
+            manifest[filename] = {"sha256": digest, "ids": []}
+            print(f"no chunks in {filename}")
+            continue
+
+        texts = [doc.page_content for doc in docs]
+        metadatas = [doc.metadata for doc in docs]
+        ids = [str(uuid.uuid4()) for _ in docs]
+        vectors = _embed_in_batches(embeddings, texts, rate_limiter)
+
+        if vectorstore is None:
+            vectorstore = FAISS.from_embeddings(
+                list(zip(texts, vectors)), embeddings, metadatas=metadatas, ids=ids
+            )
+        else:
+            vectorstore.add_embeddings(list(zip(texts, vectors)), metadatas=metadatas, ids=ids)
+
+        manifest[filename] = {"sha256": digest, "ids": ids}
+        print(f"added {len(docs)} chunks from {filename}")
+
+    if vectorstore is None:
+        print("No criteria papers to index.")
+        return
+
+    vectorstore.save_local(index_directory)
+    _save_manifest(manifest, index_directory)
+    if mmap_directory:
+        export_vectorstore(vectorstore, mmap_directory, index_directory)
 
     print("Indexed and saved criteria papers.")
 
@@ -0,0 +1,111 @@
+import argparse
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from dotenv import load_dotenv
+
+DEFAULT_HOST = "127.0.0.1"
+DEFAULT_PORT = 8765
+
+# the manuscript under review is module-level state of tools.tools,
+# so jobs are run one at a time while the resources stay resident
+_job_lock = threading.Lock()
+
+
+def preload() -> None:
+    """Imports the heavy libraries and loads the parser, indexes and model clients once."""
+    import pdfminer.high_level  # noqa: F401
+
+    from agents import section_pipeline  # noqa: F401
+    from tools import resources
+
+    resources.get_core_recipe()
+    resources.warm_up()
+    print(resources.get_load_report())
+
+
+class EvaluationRequestHandler(BaseHTTPRequestHandler):
+    """
+    GET /health reports that the service is up.
+    POST /evaluate with {"path": manuscript_path} streams one JSON line per
+    reviewed section as soon as it completes, followed by the merged result.
+    """
+
+    def _send_json(self, status: int, body: dict) -> None:
+        payload = json.dumps(body).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def _write_line(self, record: dict) -> None:
+        self.wfile.write((json.dumps(record) + "\n").encode("utf-8"))
+        self.wfile.flush()
+
+    def do_GET(self):
+        if self.path == "/health":
+            self._send_json(200, {"status": "ok"})
+        else:
+            self._send_json(404, {"error": f"unknown endpoint {self.path}"})
+
+    def do_POST(self):
+        if self.path != "/evaluate":
+            self._send_json(404, {"error": f"unknown endpoint {self.path}"})
+            return
+        try:
+            length = int(self.headers.get("Content-Length", 0))
+            job = json.loads(self.rfile.read(length))
+            manuscript_path = job["path"].strip().strip('"\'')
+        except (ValueError, KeyError, AttributeError):
+            self._send_json(400, {"error": 'the request body must be {"path": manuscript_path}'})
+            return
+
+        from agents.section_pipeline import aggregate_feedback, iter_section_records, prepare_manuscript
+        from tools import tracing
+        from tools.tools import clear_run_state
+
+        self.send_response(200)
+        self.send_header("Content-Type", "application/x-ndjson")
+        self.end_headers()
+
+        with _job_lock:
+            tracing.start_run("service")
+            start = time.time()
+            try:
+                section_titles = prepare_manuscript(manuscript_path)
+                records = {}
+                for record in iter_section_records(section_titles):
+                    records[record["Section Title"]] = record
+                    self._write_line(record)
+                merged = aggregate_feedback([records[title] for title in section_titles])
+                clear_run_state()
+                self._write_line(dict(merged, seconds=time.time() - start))
+            except Exception as error:
+                self._write_line({"error": repr(error)})
+            finally:
+                tracing.finish_run()
+
+
+def serve(host: str = DEFAULT_HOST, port: int = DEFAULT_PORT) -> None:
+    preload()
+    server = ThreadingHTTPServer((host, port), EvaluationRequestHandler)
+    print(f"Listening on http://{host}:{port}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Keep the evaluation pipeline resident and serve review jobs.")
+    parser.add_argument("--host", default=DEFAULT_HOST)
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT)
+    args = parser.parse_args()
+
+    load_dotenv()
+    serve(args.host, args.port)
@@ -0,0 +1,132 @@
+"""
+Offline tests of the concurrency helpers and the section index. The models,
+embeddings and criteria store are replaced by the fakes of benchmarks/fakes.py.
+"""
+import random
+import re
+import threading
+import time
+from typing import Any, List, Optional
+
+import pytest
+from langchain_core.language_models.llms import LLM
+
+from benchmarks import synthetic
+from benchmarks.fakes import install_fakes
+from tools import concurrency, parse_cache, resources, run_state
+from tools import tools as review_tools
+from tools.pdf_extract import iter_pdf_lines
+from tools.section_index import SectionIndex
+
+
+class EchoLLM(LLM):
+    """Answers the question of a question answering prompt after a random delay, so calls finish out of order."""
+
+    @property
+    def _llm_type(self) -> str:
+        return "echo"
+
+    def _call(self, prompt: str, stop: Optional[List[str]] = None, run_manager=None, **kwargs: Any) -> str:
+        time.sleep(random.uniform(0, 0.02))
+        return "answer to " + re.search(r"Question: (.*)", prompt).group(1).strip()
+
+
+def _line_scan(lines: list, section_titles: list, section_title: str) -> str:
+    # the line-by-line scan SectionIndex replaced, over already extracted lines
+    content_started = False
+    content = ""
+    next_index = 0
+    is_last_section = section_titles.index(section_title) == len(section_titles) - 1
+    for line_text in lines:
+        if line_text.replace(" ", "") == section_title.replace(" ", ""):
+            content_started = True
+            next_index = section_titles.index(section_title) + 1
+            continue
+        if content_started:
+            if not is_last_section:
+                if line_text.replace(" ", "") == section_titles[next_index].replace(" ", ""):
+                    return content
+            content += line_text + "\n"
+    return content
+
+
+@pytest.fixture
+def manuscript(tmp_path, monkeypatch):
+    """A synthetic manuscript under review, with offline models and no rate limit or run state."""
+    monkeypatch.setattr(parse_cache, "PARSE_CACHE_DIRECTORY", str(tmp_path / "parse_cache"))
+    monkeypatch.setattr(run_state, "RUN_STATE_ENABLED", False)
+    monkeypatch.setattr(concurrency, "_default_rate_limiter", concurrency.TokenBucket(0))
+    path = str(tmp_path / "manuscript.pdf")
+    parsed = synthetic.generate_manuscript(path, 4, 3)
+    parse_cache._write_cache(parse_cache.cache_key(path), parsed)
+    install_fakes()
+    review_tools.set_path(path)
+    review_tools.fetch_all_section_titles()
+    yield path
+    resources.reset()
+
+
+def test_token_bucket_limits_rate():
+    bucket = concurrency.TokenBucket(rate=50, capacity=1)
+    start = time.monotonic()
+    for _ in range(11):
+        bucket.acquire()
+    # the first token is available at once, the other ten are refilled at 50 per second
+    assert time.monotonic() - start >= 0.18
+
+
+def test_token_bucket_limits_rate_across_threads():
+    bucket = concurrency.TokenBucket(rate=50, capacity=1)
+    start = time.monotonic()
+    threads = [threading.Thread(target=lambda: [bucket.acquire() for _ in range(3)]) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert time.monotonic() - start >= 0.18
+
+
+def test_map_bounded_keeps_input_order():
+    def delayed(item):
+        time.sleep(random.uniform(0, 0.01))
+        return item * 2
+
+    assert concurrency.map_bounded(delayed, range(20), max_workers=4) == [item * 2 for item in range(20)]
+
+
+def test_definitions_order_is_deterministic(manuscript):
+    resources.override("instruct_llm", EchoLLM())
+    subquestions = [f"Does the manuscript address concern {number}?" for number in range(12)]
+    for _ in range(3):
+        review_tools.subquestion_answers.clear()
+        definitions = review_tools.get_section_definitions(review_tools.section_title_list[0], subquestions)
+        assert list(definitions) == subquestions
+        assert all(answer == f"answer to {question}" for question, answer in definitions.items())
+
+
+def test_section_index_matches_line_scan(manuscript):
+    lines = [line_text for _, line_text in iter_pdf_lines(manuscript, max_workers=1)]
+    section_titles = review_tools.section_title_list
+    index = SectionIndex.from_lines(enumerate(lines, start=1), section_titles)
+    for section_title in section_titles:
+        assert index.get_content(section_title) == _line_scan(lines, section_titles, section_title)
+        assert review_tools._fetch_section_content_by_titles(section_title) == _line_scan(
+            lines, section_titles, section_title
+        )
+
+
+@pytest.mark.parametrize(
+    "lines",
+    [
+        ["Title", "1 Intro", "a", "b", "2 Method", "c", "3 End", "d"],
+        # a missing title, a title with different spacing and the last section running to the end
+        ["1 Intro", "a", "2  Method", "c", "d"],
+        # the title of the section repeated inside it
+        ["1 Intro", "a", "1 Intro", "b", "2 Method", "c", "3 End"],
+    ],
+)
+def test_section_index_matches_line_scan_edge_cases(lines):
+    section_titles = ["1 Intro", "2 Method", "3 End"]
+    index = SectionIndex.from_lines(enumerate(lines, start=1), section_titles)
+    for section_title in section_titles:
+        assert index.get_content(section_title) == _line_scan(lines, section_titles, section_title)
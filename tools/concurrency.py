@@ -0,0 +1,185 @@
+import contextvars
+import os
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from tools import tracing
+from tools.json_repair import MalformedOutputError
+from tools.llm_cache import bypass_llm_cache
+
+# upper bound on model calls that are in flight at the same time
+MAX_CONCURRENCY = int(os.environ.get("SE_EVAL_MAX_CONCURRENCY", "4"))
+# sustained model calls per second, 0 disables rate limiting
+REQUESTS_PER_SECOND = float(os.environ.get("SE_EVAL_REQUESTS_PER_SECOND", "3"))
+# attempts of a pipeline stage, and the wait before its first retry in seconds
+RETRY_ATTEMPTS = int(os.environ.get("SE_EVAL_RETRY_ATTEMPTS", "3"))
+RETRY_INITIAL_BACKOFF = float(os.environ.get("SE_EVAL_RETRY_BACKOFF", "2"))
+
+
+class TokenBucket:
+    """
+    A thread-safe token bucket rate limiter. Tokens are refilled at rate per
+    second up to capacity, and every acquire() takes one token, blocking until
+    one is available.
+    """
+
+    def __init__(self, rate: float, capacity: int = None):
+        self.rate = rate
+        self.capacity = capacity if capacity is not None else max(1, int(rate))
+        self._tokens = float(self.capacity)
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _refill(self) -> None:
+        now = time.monotonic()
+        self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def acquire(self) -> None:
+        if self.rate <= 0:
+            return
+        while True:
+            with self._lock:
+                self._refill()
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                wait = (1 - self._tokens) / self.rate
+            time.sleep(wait)
+
+
+_default_rate_limiter = TokenBucket(REQUESTS_PER_SECOND)
+# every model call holds one of these slots while it runs, whichever thread pool it
+# was started from, so nested pools never have more than MAX_CONCURRENCY calls in flight
+_model_call_slots = threading.BoundedSemaphore(MAX_CONCURRENCY)
+
+
+def map_bounded(func, items, max_workers: int = None) -> list:
+    """
+    The function applies func to every item on a bounded thread pool and returns
+    the results in the order of items, regardless of the order they finish in.
+    The model calls made by func are limited by call_with_rate_limit, not by
+    the pool.
+
+    Parameters:
+        func: the function to apply to each item
+        items: the items to process
+        max_workers (int): the number of threads, defaults to MAX_CONCURRENCY
+
+    Returns:
+        list: func(item) for every item, in input order
+    """
+    items = list(items)
+    if not items:
+        return []
+    max_workers = max_workers or MAX_CONCURRENCY
+
+    if max_workers <= 1:
+        return [func(item) for item in items]
+
+    with ThreadPoolExecutor(max_workers=min(max_workers, len(items))) as executor:
+        # each task runs in a copy of the caller's context so context variables carry over
+        futures = [
+            executor.submit(contextvars.copy_context().run, func, item)
+            for item in items
+        ]
+        return [future.result() for future in futures]
+
+
+class AdaptiveRateLimiter:
+    """
+    A rate limiter that backs off when the API reports rate limiting and speeds
+    back up after successful calls, instead of sleeping a fixed time per call.
+    """
+
+    def __init__(self, min_delay: float = 0.0, max_delay: float = 60.0, initial_backoff: float = 1.0):
+        self.min_delay = min_delay
+        self.max_delay = max_delay
+        self.initial_backoff = initial_backoff
+        self.delay = min_delay
+        self._lock = threading.Lock()
+
+    def wait(self) -> None:
+        if self.delay > 0:
+            time.sleep(self.delay)
+
+    def on_success(self) -> None:
+        with self._lock:
+            self.delay = max(self.min_delay, self.delay / 2)
+            if self.delay < self.initial_backoff / 8:
+                self.delay = self.min_delay
+
+    def on_rate_limit(self) -> None:
+        with self._lock:
+            self.delay = min(self.max_delay, max(self.initial_backoff, self.delay * 2))
+
+
+def _is_rate_limit_error(error: Exception) -> bool:
+    try:
+        from openai import RateLimitError
+    except ImportError:
+        return False
+    return isinstance(error, RateLimitError)
+
+
+_model_rate_limiter = AdaptiveRateLimiter()
+
+
+def call_with_rate_limit(func, rate_limiter: AdaptiveRateLimiter = None, max_retries: int = 6):
+    """
+    The function makes a model call. Every attempt waits as long as the rate
+    limiter asks, takes a token of the REQUESTS_PER_SECOND bucket and holds one
+    of the MAX_CONCURRENCY model call slots, and the call is retried with a
+    longer delay whenever it is rate limited. rate_limiter defaults to one
+    shared by the whole process.
+    """
+    rate_limiter = rate_limiter or _model_rate_limiter
+    for attempt in range(max_retries + 1):
+        rate_limiter.wait()
+        _default_rate_limiter.acquire()
+        try:
+            with _model_call_slots:
+                result = func()
+        except Exception as error:
+            if not _is_rate_limit_error(error) or attempt == max_retries:
+                raise
+            rate_limiter.on_rate_limit()
+            continue
+        rate_limiter.on_success()
+        return result
+
+
+def _is_retryable_error(error: Exception) -> bool:
+    # rate limits are not retried here, call_with_rate_limit already retries them
+    if isinstance(error, MalformedOutputError):
+        return True
+    try:
+        import openai
+    except ImportError:
+        return False
+    return isinstance(error, (openai.APIConnectionError, openai.APITimeoutError, openai.InternalServerError))
+
+
+def retry_with_backoff(func, max_attempts: int = RETRY_ATTEMPTS, initial_backoff: float = RETRY_INITIAL_BACKOFF):
+    """
+    The function calls func until it succeeds, at most max_attempts times. After
+    a connection or server error, or a malformed model answer it waits
+    initial_backoff seconds, doubled after every failed attempt, with jitter.
+    Any other error is raised at once. The attempts after a malformed answer
+    skip the LLM cache, which would otherwise return the same answer again.
+    """
+    bypass_cache = False
+    for attempt in range(max_attempts):
+        try:
+            if bypass_cache:
+                with bypass_llm_cache():
+                    return func()
+            return func()
+        except Exception as error:
+            if not _is_retryable_error(error) or attempt == max_attempts - 1:
+                raise
+            bypass_cache = bypass_cache or isinstance(error, MalformedOutputError)
+            tracing.record(retries=1)
+            time.sleep(initial_backoff * 2 ** attempt * random.uniform(0.5, 1.5))
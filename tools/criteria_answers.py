@@ -0,0 +1,94 @@
+import hashlib
+import json
+import os
+
+from tools import resources, tracing
+from tools.concurrency import call_with_rate_limit, map_bounded
+from tools.hashing import update_with_file
+
+CRITERIA_ANSWERS_PATH = "tools/criteria_answers.json"
+
+# bump when the layout of the answers file changes
+CRITERIA_ANSWERS_FORMAT_VERSION = 1
+
+
+def fingerprint() -> str:
+    """
+    The function returns a hash of the quality checklist and the criteria index.
+    Stored answers are only valid for the fingerprint they were built with.
+    """
+    digest = hashlib.sha256()
+    paths = [resources.QUALITY_CHECKLIST_PATH]
+    for filename in sorted(os.listdir(resources.CRITERIA_INDEX_DIRECTORY)):
+        paths.append(os.path.join(resources.CRITERIA_INDEX_DIRECTORY, filename))
+
+    for path in paths:
+        if not os.path.isfile(path):
+            continue
+        digest.update(os.path.basename(path).encode("utf-8"))
+        update_with_file(digest, path)
+    return digest.hexdigest()
+
+
+def _all_subquestions(checklist: dict) -> list:
+    subquestions = []
+    for questions in checklist.values():
+        for q in questions:
+            for subquestion in q["Subquestions"]:
+                if subquestion not in subquestions:
+                    subquestions.append(subquestion)
+    return subquestions
+
+
+def build_criteria_answers(output_path: str = CRITERIA_ANSWERS_PATH) -> dict:
+    """
+    The function answers every subquestion of the quality checklist against the
+    criteria index and saves the answers to a versioned lookup file.
+
+    Parameters:
+        output_path (str): where to write the answers file
+
+    Returns:
+        dict: the subquestion to answer mapping
+    """
+    subquestions = _all_subquestions(resources.get_checklist())
+    qa = resources.get_retrieval_qa()
+    results = map_bounded(
+        lambda subquestion: call_with_rate_limit(
+            lambda: qa.invoke(subquestion, config=tracing.traced_config())
+        )["result"],
+        subquestions,
+    )
+    answers = dict(zip(subquestions, results))
+
+    with open(output_path, "w") as file:
+        json.dump(
+            {
+                "version": CRITERIA_ANSWERS_FORMAT_VERSION,
+                "fingerprint": fingerprint(),
+                "answers": answers,
+            },
+            file,
+            indent=4,
+        )
+    return answers
+
+
+def load_criteria_answers(path: str = CRITERIA_ANSWERS_PATH) -> dict:
+    """
+    The function returns the precomputed subquestion answers. An empty dict is
+    returned when the file is missing or was built from a different checklist
+    or criteria index, so callers fall back to answering with the LLM.
+    """
+    try:
+        with open(path, "r") as file:
+            stored = json.load(file)
+    except (OSError, ValueError):
+        return {}
+
+    if stored.get("version") != CRITERIA_ANSWERS_FORMAT_VERSION:
+        return {}
+    if stored.get("fingerprint") != fingerprint():
+        print(f"{path} is out of date with the checklist or criteria index, ignoring it.")
+        return {}
+    return stored.get("answers", {})
@@ -0,0 +1,17 @@
+import hashlib
+
+# bytes read at a time, so large files are hashed without loading them whole
+READ_BLOCK_SIZE = 1024 * 1024
+
+
+def update_with_file(digest, path: str):
+    """Feeds the content of a file into a hashlib digest and returns the digest."""
+    with open(path, "rb") as file:
+        for block in iter(lambda: file.read(READ_BLOCK_SIZE), b""):
+            digest.update(block)
+    return digest
+
+
+def file_digest(path: str) -> str:
+    """Returns the sha256 hex digest of the content of a file."""
+    return update_with_file(hashlib.sha256(), path).hexdigest()
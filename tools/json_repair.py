@@ -0,0 +1,89 @@
+import ast
+import json
+import re
+
+_code_fence = re.compile(r"```(?:json)?\s*(.*?)```", re.DOTALL)
+_trailing_comma = re.compile(r",\s*([}\]])")
+
+
+class MalformedOutputError(ValueError):
+    """Raised when a model answer has no usable JSON, so the stage that asked for it can be retried."""
+
+
+def _candidates(text: str):
+    # the whole answer, then the contents of code fences, then every blob starting with a brace
+    yield text
+    for match in _code_fence.finditer(text):
+        yield match.group(1)
+    for position, character in enumerate(text):
+        if character in "{[":
+            yield text[position:]
+
+
+def _parse(candidate: str):
+    decoder = json.JSONDecoder()
+    candidate = candidate.strip()
+    for attempt in (candidate, _trailing_comma.sub(r"\1", candidate)):
+        try:
+            return decoder.raw_decode(attempt)[0]
+        except ValueError:
+            pass
+    # python literals, e.g. single-quoted keys, as when the checklist dict itself is echoed back
+    end = max(candidate.rfind("}"), candidate.rfind("]"))
+    if end != -1:
+        try:
+            value = ast.literal_eval(candidate[:end + 1])
+        except (ValueError, SyntaxError, MemoryError, RecursionError):
+            return None
+        if isinstance(value, (dict, list)):
+            return value
+    return None
+
+
+def repair_json(text: str):
+    """
+    The function parses the JSON of a model answer. It tolerates text around
+    the blob, markdown code fences, trailing commas and python literals.
+
+    Parameters:
+        text (str): the model answer
+
+    Returns:
+        the first JSON object or array found
+
+    Raises:
+        MalformedOutputError: if the answer has no JSON object or array
+    """
+    for candidate in _candidates(text):
+        value = _parse(candidate)
+        if isinstance(value, (dict, list)):
+            return value
+    raise MalformedOutputError(f"no JSON found in the model answer: {text[:200]!r}")
+
+
+def parse_feedback(review: str) -> list:
+    """
+    The function returns the $REVIEW JSON blobs found in a section review. It
+    accepts a {"Feedback": [...]} blob, a list of reviews, single review blobs,
+    or any of these surrounded by other text.
+    """
+    decoder = json.JSONDecoder()
+    feedback = []
+    position = 0
+    while position < len(review):
+        if review[position] not in "{[":
+            position += 1
+            continue
+        try:
+            blob, end = decoder.raw_decode(review, position)
+        except ValueError:
+            position += 1
+            continue
+        position = end
+
+        if isinstance(blob, dict) and isinstance(blob.get("Feedback"), list):
+            blob = blob["Feedback"]
+        for item in blob if isinstance(blob, list) else [blob]:
+            if isinstance(item, dict) and "Comment" in item:
+                feedback.append(item)
+    return feedback
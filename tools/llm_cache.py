@@ -0,0 +1,237 @@
+import contextlib
+import contextvars
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from typing import List, Optional
+
+import numpy as np
+from langchain_core.caches import BaseCache, RETURN_VAL_TYPE
+from langchain_core.embeddings import Embeddings
+from langchain_core.load import dumps, loads
+
+from tools import tracing
+
+LLM_CACHE_PATH = os.path.join(".cache", "llm_cache.sqlite")
+LLM_CACHE_ENABLED = os.environ.get("SE_EVAL_LLM_CACHE", "1") != "0"
+# entries older than this are treated as misses, None keeps entries forever
+LLM_CACHE_TTL_SECONDS = None
+# the least recently used entries are evicted beyond this many rows per table
+LLM_CACHE_MAX_ENTRIES = 100_000
+# embeddings are stored as float32 blobs, a 1536-dimension vector takes about
+# 8 KB of the database with its key, so the embedding table stays under about 320 MB
+EMBEDDING_CACHE_MAX_ENTRIES = 40_000
+
+# set while a call is retried after a malformed answer, so the cached answer is not served again
+_bypass_lookup = contextvars.ContextVar("bypass_llm_cache", default=False)
+
+
+def _hash_key(*parts: str) -> str:
+    digest = hashlib.sha256()
+    for part in parts:
+        digest.update(part.encode("utf-8"))
+        digest.update(b"\0")
+    return digest.hexdigest()
+
+
+class _SQLiteStore:
+    """A small key-value table in a SQLite file with TTL and LRU size eviction."""
+
+    def __init__(self, database_path: str, table: str, ttl_seconds: Optional[float], max_entries: int):
+        directory = os.path.dirname(database_path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self.table = table
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._connection = sqlite3.connect(database_path, timeout=30, check_same_thread=False)
+        with self._lock, self._connection:
+            self._connection.execute("PRAGMA journal_mode=WAL")
+            self._connection.execute(
+                f"CREATE TABLE IF NOT EXISTS {table} ("
+                "key TEXT PRIMARY KEY, value TEXT NOT NULL, "
+                "created_at REAL NOT NULL, accessed_at REAL NOT NULL)"
+            )
+            self._connection.execute(
+                f"CREATE INDEX IF NOT EXISTS {table}_accessed_at ON {table} (accessed_at)"
+            )
+
+    def get(self, key: str):
+        now = time.time()
+        with self._lock, self._connection:
+            row = self._connection.execute(
+                f"SELECT value, created_at FROM {self.table} WHERE key = ?", (key,)
+            ).fetchone()
+            if row is not None and self.ttl_seconds is not None and now - row[1] > self.ttl_seconds:
+                self._connection.execute(f"DELETE FROM {self.table} WHERE key = ?", (key,))
+                row = None
+            if row is None:
+                self.misses += 1
+                return None
+            self._connection.execute(
+                f"UPDATE {self.table} SET accessed_at = ? WHERE key = ?", (now, key)
+            )
+            self.hits += 1
+        tracing.record(cache_hits=1)
+        return row[0]
+
+    def set(self, key: str, value) -> None:
+        now = time.time()
+        with self._lock, self._connection:
+            self._connection.execute(
+                f"INSERT OR REPLACE INTO {self.table} VALUES (?, ?, ?, ?)",
+                (key, value, now, now),
+            )
+            self._connection.execute(
+                f"DELETE FROM {self.table} WHERE key IN ("
+                f"SELECT key FROM {self.table} ORDER BY accessed_at DESC LIMIT -1 OFFSET ?)",
+                (self.max_entries,),
+            )
+
+    def clear(self) -> None:
+        with self._lock, self._connection:
+            self._connection.execute(f"DELETE FROM {self.table}")
+
+
+class SQLiteLLMCache(BaseCache):
+    """
+    A persistent LangChain LLM cache. Entries are keyed on a hash of the model
+    string (model name and parameters) and the rendered prompt.
+    """
+
+    def __init__(
+        self,
+        database_path: str = LLM_CACHE_PATH,
+        ttl_seconds: Optional[float] = LLM_CACHE_TTL_SECONDS,
+        max_entries: int = LLM_CACHE_MAX_ENTRIES,
+    ):
+        self.store = _SQLiteStore(database_path, "llm_cache", ttl_seconds, max_entries)
+
+    def lookup(self, prompt: str, llm_string: str) -> Optional[RETURN_VAL_TYPE]:
+        # a bypassed lookup is a miss, so the fresh answer replaces the cached one
+        if _bypass_lookup.get():
+            return None
+        value = self.store.get(_hash_key(llm_string, prompt))
+        if value is None:
+            return None
+        return [loads(generation) for generation in json.loads(value)]
+
+    def update(self, prompt: str, llm_string: str, return_val: RETURN_VAL_TYPE) -> None:
+        value = json.dumps([dumps(generation) for generation in return_val])
+        self.store.set(_hash_key(llm_string, prompt), value)
+
+    def clear(self, **kwargs) -> None:
+        self.store.clear()
+
+
+def _encode_vector(vector: List[float]) -> bytes:
+    return np.asarray(vector, dtype=np.float32).tobytes()
+
+
+def _decode_vector(value) -> List[float]:
+    # entries written before the vectors were stored as float32 blobs are JSON text
+    if isinstance(value, str):
+        return json.loads(value)
+    return np.frombuffer(value, dtype=np.float32).tolist()
+
+
+class CachedEmbeddings(Embeddings):
+    """
+    Wraps an embeddings client so that every text is embedded at most once per
+    model. Documents and queries share the same cache, and the vectors are
+    stored as float32 blobs.
+    """
+
+    def __init__(
+        self,
+        underlying: Embeddings,
+        database_path: str = LLM_CACHE_PATH,
+        ttl_seconds: Optional[float] = LLM_CACHE_TTL_SECONDS,
+        max_entries: int = EMBEDDING_CACHE_MAX_ENTRIES,
+    ):
+        self.underlying = underlying
+        self.namespace = getattr(underlying, "model", type(underlying).__name__)
+        self.store = _SQLiteStore(database_path, "embedding_cache", ttl_seconds, max_entries)
+
+    def _key(self, text: str) -> str:
+        return _hash_key(self.namespace, text)
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        vectors = [None] * len(texts)
+        missing = {}
+        for i, text in enumerate(texts):
+            value = self.store.get(self._key(text))
+            if value is None:
+                missing.setdefault(text, []).append(i)
+            else:
+                vectors[i] = _decode_vector(value)
+
+        if missing:
+            new_vectors = self.underlying.embed_documents(list(missing))
+            for (text, positions), vector in zip(missing.items(), new_vectors):
+                value = _encode_vector(vector)
+                self.store.set(self._key(text), value)
+                # a new vector is returned as it is stored, so a hit returns the same vector
+                vector = _decode_vector(value)
+                for i in positions:
+                    vectors[i] = vector
+        return vectors
+
+    def embed_query(self, text: str) -> List[float]:
+        value = self.store.get(self._key(text))
+        if value is not None:
+            return _decode_vector(value)
+        value = _encode_vector(self.underlying.embed_query(text))
+        self.store.set(self._key(text), value)
+        return _decode_vector(value)
+
+
+@contextlib.contextmanager
+def bypass_llm_cache():
+    """Makes the model calls of the enclosed block skip the cache lookup, their answers are still stored."""
+    token = _bypass_lookup.set(True)
+    try:
+        yield
+    finally:
+        _bypass_lookup.reset(token)
+
+
+_llm_cache = None
+
+
+def install_llm_cache() -> Optional[SQLiteLLMCache]:
+    """Installs the SQLite cache under every LangChain model call in this process."""
+    global _llm_cache
+    if not LLM_CACHE_ENABLED:
+        return None
+    if _llm_cache is None:
+        from langchain_core.globals import set_llm_cache
+
+        _llm_cache = SQLiteLLMCache()
+        set_llm_cache(_llm_cache)
+    return _llm_cache
+
+
+def cached_embeddings(underlying: Embeddings) -> Embeddings:
+    """Returns underlying wrapped in the persistent embedding cache, if enabled."""
+    if not LLM_CACHE_ENABLED:
+        return underlying
+    return CachedEmbeddings(underlying)
+
+
+def get_cache_stats(embeddings: Embeddings = None) -> dict:
+    """Returns the hit and miss counters of the LLM cache and of an embeddings cache."""
+    stats = {}
+    if _llm_cache is not None:
+        stats["llm_hits"] = _llm_cache.store.hits
+        stats["llm_misses"] = _llm_cache.store.misses
+    if isinstance(embeddings, CachedEmbeddings):
+        stats["embedding_hits"] = embeddings.store.hits
+        stats["embedding_misses"] = embeddings.store.misses
+    return stats
@@ -0,0 +1,180 @@
+import json
+import math
+import os
+
+import numpy as np
+
+OPENREVIEW_DATA_PATH = "correct_file.json"
+OPENREVIEW_INDEX_DIRECTORY = "openreview_index"
+
+# bump when the on-disk layout of the index changes
+OPENREVIEW_INDEX_FORMAT_VERSION = 1
+
+# the BM25Okapi parameters used by BM25Retriever
+BM25_K1 = 1.5
+BM25_B = 0.75
+BM25_EPSILON = 0.25
+
+
+def tokenize(text: str) -> list:
+    """Splits text into terms the same way as BM25Retriever's default preprocessing."""
+    return text.split()
+
+
+def _eligible_paper(submission: dict):
+    # only the first version is indexed, and only if it can be matched and has reviews
+    paper = submission["article_versions"].get("0")
+    if paper and paper["title"] and paper["abstract"] and paper["reviews"] != []:
+        return paper
+    return None
+
+
+def build_openreview_index(
+    data_path: str = OPENREVIEW_DATA_PATH,
+    index_directory: str = OPENREVIEW_INDEX_DIRECTORY,
+) -> int:
+    """
+    The function builds an on-disk BM25 index over the OpenReview submissions.
+    Documents are identified by their position in orb_submissions, so the ids
+    stay stable for the same data file.
+
+    Parameters:
+        data_path (str): the OpenReview submissions JSON file
+        index_directory (str): where to write the index
+
+    Returns:
+        int: the number of indexed submissions
+    """
+    with open(data_path, "r") as file:
+        data = json.load(file)
+
+    os.makedirs(index_directory, exist_ok=True)
+    doc_ids = []
+    doc_lengths = []
+    term_frequencies = {}
+    review_offsets = []
+
+    with open(os.path.join(index_directory, "reviews.jsonl"), "wb") as reviews_file:
+        for submission_id, submission in enumerate(data["orb_submissions"]):
+            paper = _eligible_paper(submission)
+            if paper is None:
+                continue
+
+            doc_position = len(doc_ids)
+            terms = tokenize(paper["title"] + ": " + paper["abstract"])
+            doc_ids.append(submission_id)
+            doc_lengths.append(len(terms))
+            for term in terms:
+                postings = term_frequencies.setdefault(term, {})
+                postings[doc_position] = postings.get(doc_position, 0) + 1
+
+            reviews = [
+                (version["title"], version["reviews"])
+                for version in submission["article_versions"].values()
+            ]
+            review_offsets.append(reviews_file.tell())
+            reviews_file.write((json.dumps(reviews) + "\n").encode("utf-8"))
+        review_offsets.append(reviews_file.tell())
+
+    num_docs = len(doc_ids)
+    idf = {
+        term: math.log(num_docs - len(postings) + 0.5) - math.log(len(postings) + 0.5)
+        for term, postings in term_frequencies.items()
+    }
+    # BM25Okapi floors negative idf values at a fraction of the average idf
+    average_idf = sum(idf.values()) / len(idf) if idf else 0.0
+    floor = BM25_EPSILON * average_idf
+
+    vocabulary = {}
+    postings_docs = []
+    postings_tfs = []
+    for term in sorted(term_frequencies):
+        postings = term_frequencies[term]
+        term_idf = idf[term] if idf[term] >= 0 else floor
+        vocabulary[term] = [len(postings_docs), len(postings), term_idf]
+        for doc_position in sorted(postings):
+            postings_docs.append(doc_position)
+            postings_tfs.append(postings[doc_position])
+
+    np.save(os.path.join(index_directory, "doc_ids.npy"), np.array(doc_ids, dtype=np.int32))
+    np.save(os.path.join(index_directory, "doc_lengths.npy"), np.array(doc_lengths, dtype=np.float32))
+    np.save(os.path.join(index_directory, "postings_docs.npy"), np.array(postings_docs, dtype=np.int32))
+    np.save(os.path.join(index_directory, "postings_tfs.npy"), np.array(postings_tfs, dtype=np.float32))
+    np.save(os.path.join(index_directory, "review_offsets.npy"), np.array(review_offsets, dtype=np.int64))
+    with open(os.path.join(index_directory, "vocabulary.json"), "w") as file:
+        json.dump(vocabulary, file)
+    with open(os.path.join(index_directory, "meta.json"), "w") as file:
+        json.dump(
+            {
+                "version": OPENREVIEW_INDEX_FORMAT_VERSION,
+                "num_docs": num_docs,
+                "average_length": float(np.mean(doc_lengths)) if doc_lengths else 0.0,
+                "k1": BM25_K1,
+                "b": BM25_B,
+            },
+            file,
+        )
+    return num_docs
+
+
+class OpenReviewIndex:
+    """
+    A read-only BM25 index over the OpenReview submissions. The postings and
+    document arrays are memory-mapped and reviews are read one record at a time,
+    so the submissions JSON never has to be loaded.
+    """
+
+    def __init__(self, index_directory: str = OPENREVIEW_INDEX_DIRECTORY):
+        self.index_directory = index_directory
+        with open(os.path.join(index_directory, "meta.json"), "r") as file:
+            self.meta = json.load(file)
+        if self.meta["version"] != OPENREVIEW_INDEX_FORMAT_VERSION:
+            raise ValueError(
+                f"{index_directory} was built with an older index format, rebuild it with build_openreview_index.py."
+            )
+        with open(os.path.join(index_directory, "vocabulary.json"), "r") as file:
+            self.vocabulary = json.load(file)
+
+        def load(name):
+            return np.load(os.path.join(index_directory, name), mmap_mode="r")
+
+        self.doc_ids = load("doc_ids.npy")
+        self.doc_lengths = load("doc_lengths.npy")
+        self.postings_docs = load("postings_docs.npy")
+        self.postings_tfs = load("postings_tfs.npy")
+        self.review_offsets = load("review_offsets.npy")
+
+    def search(self, query: str, k: int = 4) -> list:
+        """Returns the submission ids of the top k documents for the query, best first."""
+        k1 = self.meta["k1"]
+        b = self.meta["b"]
+        length_norm = k1 * (1 - b + b * self.doc_lengths / max(self.meta["average_length"], 1e-9))
+        scores = np.zeros(self.meta["num_docs"], dtype=np.float32)
+
+        for term in tokenize(query):
+            entry = self.vocabulary.get(term)
+            if entry is None:
+                continue
+            offset, df, idf = entry
+            docs = self.postings_docs[offset:offset + df]
+            tfs = self.postings_tfs[offset:offset + df]
+            scores[docs] += idf * tfs * (k1 + 1) / (tfs + length_norm[docs])
+
+        k = min(k, len(scores))
+        if k == 0:
+            return []
+        top = np.argpartition(-scores, k - 1)[:k]
+        # ties keep the document order, like a stable sort of the scores
+        top = sorted(top, key=lambda position: (-scores[position], position))
+        return [int(self.doc_ids[position]) for position in top]
+
+    def get_reviews(self, submission_id: int) -> list:
+        """Returns the (title, reviews) pairs of every version of a submission."""
+        position = int(np.searchsorted(self.doc_ids, submission_id))
+        if position >= len(self.doc_ids) or self.doc_ids[position] != submission_id:
+            raise KeyError(submission_id)
+        start = int(self.review_offsets[position])
+        end = int(self.review_offsets[position + 1])
+        with open(os.path.join(self.index_directory, "reviews.jsonl"), "rb") as file:
+            file.seek(start)
+            return [tuple(review) for review in json.loads(file.read(end - start))]
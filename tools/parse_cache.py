@@ -0,0 +1,141 @@
+import hashlib
+import json
+import os
+import tempfile
+import threading
+from collections import OrderedDict
+from importlib import metadata
+
+from tools import resources, tracing
+from tools.hashing import file_digest
+
+PARSE_CACHE_DIRECTORY = os.path.join(".cache", "papermage")
+PARSE_CACHE_MAX_BYTES = 256 * 1024 * 1024
+
+# bump when the layout of the cached parse result changes
+PARSE_CACHE_FORMAT_VERSION = 1
+
+# parse results kept in memory, the least recently used are dropped beyond this many
+PARSED_DOCUMENTS_MAX_ENTRIES = 32
+
+_parsed_documents = OrderedDict()
+_parsed_documents_lock = threading.Lock()
+
+
+def _recipe_version() -> str:
+    try:
+        papermage_version = metadata.version("papermage")
+    except metadata.PackageNotFoundError:
+        papermage_version = "unknown"
+    return f"CoreRecipe-{papermage_version}-v{PARSE_CACHE_FORMAT_VERSION}"
+
+
+def cache_key(path: str) -> str:
+    """Returns the cache key of a manuscript: its content hash plus the recipe version."""
+    key = f"{file_digest(path)}:{_recipe_version()}"
+    return hashlib.sha256(key.encode("utf-8")).hexdigest()
+
+
+def _cache_file(key: str) -> str:
+    return os.path.join(PARSE_CACHE_DIRECTORY, f"{key}.json")
+
+
+def _run_core_recipe(path: str) -> dict:
+    recipe = resources.get_core_recipe()
+    doc = recipe.run(path)
+    return {
+        "sections": [section.text for section in doc.sections],
+        "titles": [title.text for title in doc.titles],
+        "abstracts": [abstract.text for abstract in doc.abstracts],
+    }
+
+
+def _read_cache(key: str):
+    cache_file = _cache_file(key)
+    try:
+        with open(cache_file, "r") as file:
+            parsed = json.load(file)
+    except (OSError, ValueError):
+        return None
+
+    # refresh the access time so that eviction is least recently used
+    try:
+        os.utime(cache_file)
+    except FileNotFoundError:
+        # another process evicted it after the read, the parse result is still good
+        pass
+    return parsed
+
+
+def _write_cache(key: str, parsed: dict) -> None:
+    os.makedirs(PARSE_CACHE_DIRECTORY, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=PARSE_CACHE_DIRECTORY, suffix=".tmp")
+    try:
+        with os.fdopen(fd, "w") as file:
+            json.dump(parsed, file)
+        os.replace(tmp_path, _cache_file(key))
+    except BaseException:
+        # eviction only counts the entries, so a leftover temp file would never be removed
+        try:
+            os.remove(tmp_path)
+        except FileNotFoundError:
+            pass
+        raise
+    _evict(PARSE_CACHE_MAX_BYTES)
+
+
+def _evict(max_bytes: int) -> None:
+    """Removes the least recently used entries until the cache fits in max_bytes."""
+    entries = []
+    for filename in os.listdir(PARSE_CACHE_DIRECTORY):
+        if filename.endswith(".json"):
+            try:
+                stat = os.stat(os.path.join(PARSE_CACHE_DIRECTORY, filename))
+            except FileNotFoundError:
+                # another process evicted it in the meantime
+                continue
+            entries.append((stat.st_mtime, stat.st_size, filename))
+
+    total_size = sum(size for _, size, _ in entries)
+    for _, size, filename in sorted(entries):
+        if total_size <= max_bytes:
+            break
+        try:
+            os.remove(os.path.join(PARSE_CACHE_DIRECTORY, filename))
+        except FileNotFoundError:
+            pass
+        total_size -= size
+
+
+def load_parsed_document(path: str) -> dict:
+    """
+    The function returns the papermage CoreRecipe parse result of a manuscript.
+    Results are cached on disk by content hash, so the same manuscript is only
+    parsed once across runs.
+
+    Parameters:
+        path (str): the local path to the manuscript
+
+    Returns:
+        dict: the texts of the "sections", "titles" and "abstracts" of the manuscript
+    """
+    key = cache_key(path)
+    with _parsed_documents_lock:
+        if key in _parsed_documents:
+            _parsed_documents.move_to_end(key)
+            return _parsed_documents[key]
+
+    with tracing.span("parse", path=path) as parse_span:
+        parsed = _read_cache(key)
+        if parsed is None:
+            parsed = _run_core_recipe(path)
+            _write_cache(key, parsed)
+        else:
+            parse_span.cache_hits += 1
+
+    with _parsed_documents_lock:
+        _parsed_documents[key] = parsed
+        _parsed_documents.move_to_end(key)
+        while len(_parsed_documents) > PARSED_DOCUMENTS_MAX_ENTRIES:
+            _parsed_documents.popitem(last=False)
+    return parsed
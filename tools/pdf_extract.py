@@ -0,0 +1,108 @@
+import multiprocessing
+import os
+import threading
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+
+# processes running the pdfminer layout analysis, 1 extracts in the calling process;
+# more than 1 starts a spawned process pool, so the calling script needs a __main__ guard
+EXTRACT_WORKERS = int(os.environ.get("SE_EVAL_EXTRACT_WORKERS", "1"))
+# pages analysed by one task, documents of at most this many pages are extracted in the calling process
+PAGES_PER_CHUNK = int(os.environ.get("SE_EVAL_EXTRACT_PAGES_PER_CHUNK", "8"))
+# page ranges submitted ahead of the one being read, per worker
+CHUNKS_IN_FLIGHT_PER_WORKER = 2
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def count_pages(path: str) -> int:
+    """Returns the number of pages of a PDF without running the layout analysis."""
+    from pdfminer.pdfpage import PDFPage
+
+    with open(path, "rb") as file:
+        return sum(1 for _ in PDFPage.get_pages(file))
+
+
+def _iter_page_range(path: str, start: int = 0, end: int = None):
+    from pdfminer.high_level import extract_pages
+    from pdfminer.layout import LTTextContainer
+
+    # pdfminer reads every page for an empty page_numbers, so an empty range is not passed on
+    if end is not None and start >= end:
+        return
+    # without an end the pages are not counted first, they are read until the last one
+    page_numbers = range(start, end) if end is not None else None
+    page_layouts = extract_pages(path, page_numbers=page_numbers)
+    if page_numbers is None:
+        page_layouts = (page_layout for page_number, page_layout in enumerate(page_layouts) if page_number >= start)
+    for page_number, page_layout in enumerate(page_layouts, start=start + 1):
+        for element in page_layout:
+            if isinstance(element, LTTextContainer):
+                for text_line in element:
+                    yield page_number, text_line.get_text().strip()
+
+
+def extract_page_range(path: str, start: int, end: int) -> list:
+    """
+    The function runs the layout analysis of pages start to end - 1 (counted
+    from 0) and returns their text lines as (page_number, line_text) tuples,
+    with page numbers counted from 1.
+    """
+    return list(_iter_page_range(path, start, end))
+
+
+def _get_pool(max_workers: int) -> ProcessPoolExecutor:
+    # the pool is kept for the whole process, so its workers import pdfminer once;
+    # they are spawned because the callers run on threads
+    global _pool
+    with _pool_lock:
+        if _pool is None or _pool._max_workers != max_workers:
+            if _pool is not None:
+                _pool.shutdown(wait=False)
+            _pool = ProcessPoolExecutor(max_workers=max_workers, mp_context=multiprocessing.get_context("spawn"))
+        return _pool
+
+
+def iter_pdf_lines(path: str, max_workers: int = None):
+    """
+    The function yields the text lines of a PDF in reading order as
+    (page_number, line_text) tuples. With more than one worker, long documents
+    are split into page ranges that are analysed on a process pool, and at most
+    CHUNKS_IN_FLIGHT_PER_WORKER ranges per worker are extracted ahead of the
+    lines being read. The lines are the same as those of a sequential pass.
+
+    Parameters:
+        path (str): the PDF
+        max_workers (int): the number of processes, defaults to EXTRACT_WORKERS
+    """
+    max_workers = max_workers or EXTRACT_WORKERS
+    if max_workers <= 1:
+        yield from _iter_page_range(path)
+        return
+
+    end = count_pages(path)
+    if end <= PAGES_PER_CHUNK:
+        yield from _iter_page_range(path, 0, end)
+        return
+
+    pool = _get_pool(max_workers)
+    ranges = iter(range(0, end, PAGES_PER_CHUNK))
+    in_flight = deque()
+
+    def submit_next() -> None:
+        chunk_start = next(ranges, None)
+        if chunk_start is not None:
+            in_flight.append(pool.submit(extract_page_range, path, chunk_start, min(chunk_start + PAGES_PER_CHUNK, end)))
+
+    try:
+        for _ in range(max_workers * CHUNKS_IN_FLIGHT_PER_WORKER):
+            submit_next()
+        while in_flight:
+            lines = in_flight.popleft().result()
+            submit_next()
+            yield from lines
+    finally:
+        # a reader that stops early does not wait for the ranges it will never read
+        for future in in_flight:
+            future.cancel()
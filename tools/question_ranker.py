@@ -0,0 +1,116 @@
+import os
+import threading
+
+from tools import tracing
+from tools.token_budget import count_tokens
+
+# "llm" sends the whole checklist to the model, "hybrid" only sends the locally
+# ranked candidates and "fast" uses the local ranking without the model; "llm"
+# stays the default, it is the mode that records the recall and precision of the
+# local ranking against the model's selection
+SELECTION_MODE = os.environ.get("SE_EVAL_SELECTION_MODE", "llm")
+# the number of candidate questions sent to the model in hybrid mode
+CANDIDATE_QUESTIONS = int(os.environ.get("SE_EVAL_CANDIDATE_QUESTIONS", "6"))
+# the number of questions selected per section, as asked of the model
+SELECTED_QUESTIONS = 4
+
+# checklist tokens per mode, to compare the savings of the local ranking
+selection_stats = {}
+_stats_lock = threading.Lock()
+_vectorizers = {}
+
+
+def _question_text(aspect: str, question: dict) -> str:
+    return " ".join([aspect, question["Question"]] + list(question["Subquestions"]))
+
+
+def _fitted_vectorizer(checklist: dict, documents: list):
+    # the checklist is kept alongside its vectorizer so that its id is not reused
+    cached = _vectorizers.get(id(checklist))
+    if cached is None or cached[0] is not checklist:
+        from sklearn.feature_extraction.text import TfidfVectorizer
+
+        vectorizer = TfidfVectorizer(stop_words="english", sublinear_tf=True)
+        cached = (checklist, vectorizer, vectorizer.fit_transform(documents))
+        _vectorizers[id(checklist)] = cached
+    return cached[1], cached[2]
+
+
+def rank_questions(checklist: dict, section_content: str) -> list:
+    """
+    The function scores every checklist question against the section with TF-IDF
+    cosine similarity and returns (score, aspect, question) tuples, best first.
+    Ties keep the checklist order.
+    """
+    entries = [(aspect, question) for aspect, questions in checklist.items() for question in questions]
+    documents = [_question_text(aspect, question) for aspect, question in entries]
+    vectorizer, question_vectors = _fitted_vectorizer(checklist, documents)
+    section_vector = vectorizer.transform([section_content])
+    # the rows are l2-normalized, so the dot product is the cosine similarity
+    scores = (question_vectors @ section_vector.T).toarray().ravel()
+
+    order = sorted(range(len(entries)), key=lambda i: (-scores[i], i))
+    return [(float(scores[i]), entries[i][0], entries[i][1]) for i in order]
+
+
+def _as_checklist(checklist: dict, ranked: list) -> dict:
+    # the selected questions are returned in checklist order, grouped by aspect
+    chosen = {id(question) for _, _, question in ranked}
+    return {
+        aspect: [question for question in questions if id(question) in chosen]
+        for aspect, questions in checklist.items()
+        if any(id(question) in chosen for question in questions)
+    }
+
+
+def candidate_checklist(checklist: dict, section_content: str, top_n: int = CANDIDATE_QUESTIONS) -> dict:
+    """Returns the checklist reduced to the top_n questions for the section."""
+    return _as_checklist(checklist, rank_questions(checklist, section_content)[:top_n])
+
+
+def select_questions_locally(checklist: dict, section_content: str, top_k: int = SELECTED_QUESTIONS) -> dict:
+    """Returns the top_k questions for the section, in the format of the model's selection."""
+    return _as_checklist(checklist, rank_questions(checklist, section_content)[:top_k])
+
+
+def record_selection(mode: str, full_checklist: dict, sent_checklist: dict = None) -> None:
+    """Counts the checklist tokens that a selection sent to the model, against sending all of it."""
+    full_tokens = count_tokens(str(full_checklist))
+    sent_tokens = count_tokens(str(sent_checklist)) if sent_checklist is not None else 0
+    with _stats_lock:
+        stats = selection_stats.setdefault(mode, {"calls": 0, "full_tokens": 0, "sent_tokens": 0})
+        stats["calls"] += 1
+        stats["full_tokens"] += full_tokens
+        stats["sent_tokens"] += sent_tokens
+    tracing.annotate(selection_mode=mode, checklist_tokens=sent_tokens, checklist_tokens_saved=full_tokens - sent_tokens)
+
+
+def get_selection_report() -> str:
+    """Returns the checklist tokens sent per selection mode and the share saved."""
+    lines = []
+    for mode, stats in selection_stats.items():
+        saved = 1 - stats["sent_tokens"] / stats["full_tokens"] if stats["full_tokens"] else 0.0
+        lines.append(
+            f"{mode}: {stats['calls']} selections, {stats['sent_tokens']} of "
+            f"{stats['full_tokens']} checklist tokens sent ({saved:.0%} saved)"
+        )
+    return "\n".join(lines)
+
+
+def compare_selection(local_selection: dict, llm_selection: dict) -> dict:
+    """
+    The function compares a local selection with the model's selection of the
+    same section. recall is the share of the model's questions that the local
+    selection also picked.
+    """
+    def questions(selection):
+        return {question["Question"] for values in selection.values() for question in values}
+
+    local_questions = questions(local_selection)
+    llm_questions = questions(llm_selection)
+    overlap = local_questions & llm_questions
+    return {
+        "overlap": len(overlap),
+        "recall": len(overlap) / len(llm_questions) if llm_questions else 1.0,
+        "precision": len(overlap) / len(local_questions) if local_questions else 1.0,
+    }
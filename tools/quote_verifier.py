@@ -0,0 +1,145 @@
+import difflib
+import re
+import unicodedata
+
+# words per shingle of the index, quotes shorter than this are matched word by word
+SHINGLE_SIZE = 3
+# share of matching words above which a quote that is not found verbatim is taken as a paraphrase of the text
+FUZZY_THRESHOLD = 0.8
+# shingles occurring more often than this are too common to locate a quote and are not voted on
+MAX_POSTINGS = 200
+
+_word = re.compile(r"\w+")
+_ellipsis = re.compile(r"\.\.\.+|…")
+
+
+def _normalize(text: str) -> str:
+    # ligatures, quotes and dashes from the pdf extraction are folded to plain ascii words
+    return unicodedata.normalize("NFKC", text).lower()
+
+
+def _words(text: str) -> list:
+    return _word.findall(_normalize(text))
+
+
+class QuoteIndex:
+    """
+    An index of the word shingles of the extracted manuscript text, built once
+    per manuscript. A quote is located by looking up its shingles instead of
+    searching the whole text, and every match is anchored to the page, line and
+    character offset of the extracted text it starts at.
+    """
+
+    def __init__(self, lines: list, pages: list):
+        self.lines = lines
+        self.pages = pages
+        self.words = []
+        # (line, character offset in the extracted text) of every word
+        self.anchors = []
+        self.shingles = {}
+        self._build()
+
+    @classmethod
+    def from_section_index(cls, section_index) -> "QuoteIndex":
+        return cls(section_index.lines, section_index.pages)
+
+    def _build(self) -> None:
+        offset = 0
+        hyphenated = False
+        for line_number, line_text in enumerate(self.lines):
+            matches = list(_word.finditer(_normalize(line_text)))
+            for position, match in enumerate(matches):
+                if position == 0 and hyphenated and self.words:
+                    # a word hyphenated across a line break is indexed as one word
+                    self.words[-1] += match.group()
+                    continue
+                self.words.append(match.group())
+                self.anchors.append((line_number, offset + match.start()))
+            hyphenated = line_text.endswith("-") and bool(matches)
+            offset += len(line_text) + 1
+
+        for position in range(len(self.words) - SHINGLE_SIZE + 1):
+            shingle = tuple(self.words[position:position + SHINGLE_SIZE])
+            self.shingles.setdefault(shingle, []).append(position)
+
+    def _anchor(self, position: int) -> dict:
+        line_number, offset = self.anchors[position]
+        return {"Page": self.pages[line_number], "Line": line_number, "Offset": offset}
+
+    def _candidates(self, quote_words: list) -> dict:
+        """Votes for the positions the quote could start at, one vote per matching shingle."""
+        votes = {}
+        if len(quote_words) < SHINGLE_SIZE:
+            shingle = tuple(quote_words)
+            for position in range(len(self.words) - len(shingle) + 1):
+                if tuple(self.words[position:position + len(shingle)]) == shingle:
+                    votes[position] = 1
+            return votes
+
+        for start in range(len(quote_words) - SHINGLE_SIZE + 1):
+            postings = self.shingles.get(tuple(quote_words[start:start + SHINGLE_SIZE]), [])
+            if len(postings) > MAX_POSTINGS:
+                continue
+            for position in postings:
+                candidate = max(0, position - start)
+                votes[candidate] = votes.get(candidate, 0) + 1
+        return votes
+
+    def locate(self, quote: str) -> dict:
+        """
+        The function finds where a quote is in the manuscript.
+
+        Parameters:
+            quote (str): the quoted manuscript text
+
+        Returns:
+            dict: the "Status" of the quote, "exact", "fuzzy" or "missing", the
+            share of its words that match as "Score", and the "Page", "Line" and
+            "Offset" it starts at when it is found
+        """
+        fragments = [_words(fragment) for fragment in _ellipsis.split(quote)]
+        fragments = [fragment for fragment in fragments if fragment]
+        if not fragments:
+            return {"Status": "missing", "Score": 0.0}
+
+        # a quote shortened with an ellipsis is found when all of its fragments are
+        results = [self._locate_words(fragment) for fragment in fragments]
+        total = sum(len(fragment) for fragment in fragments)
+        score = sum(result["Score"] * len(fragment) for result, fragment in zip(results, fragments)) / total
+        if all(result["Status"] == "exact" for result in results):
+            status = "exact"
+        elif score >= FUZZY_THRESHOLD and all(result["Status"] != "missing" for result in results):
+            status = "fuzzy"
+        else:
+            status = "missing"
+        located = dict(results[0], Status=status, Score=round(score, 3))
+        if status == "missing":
+            for key in ("Page", "Line", "Offset"):
+                located.pop(key, None)
+        return located
+
+    def _locate_words(self, quote_words: list) -> dict:
+        votes = self._candidates(quote_words)
+        if not votes:
+            return {"Status": "missing", "Score": 0.0}
+
+        best = None
+        for position in sorted(votes, key=lambda candidate: (-votes[candidate], candidate))[:5]:
+            window = self.words[position:position + len(quote_words)]
+            if window == quote_words:
+                return dict(self._anchor(position), Status="exact", Score=1.0)
+            score = difflib.SequenceMatcher(None, quote_words, window, autojunk=False).ratio()
+            if best is None or score > best[0]:
+                best = (score, position)
+
+        score, position = best
+        status = "fuzzy" if score >= FUZZY_THRESHOLD else "missing"
+        return dict(self._anchor(position), Status=status, Score=round(score, 3))
+
+    def verify(self, quotes: list) -> list:
+        """Locates a batch of quotes, each distinct quote only once."""
+        located = {}
+        for quote in quotes:
+            if quote not in located:
+                located[quote] = self.locate(quote)
+        return [dict(located[quote]) for quote in quotes]
@@ -0,0 +1,175 @@
+import json
+import os
+import threading
+import time
+
+from tools import tracing
+from tools.llm_cache import cached_embeddings, get_cache_stats, install_llm_cache
+
+CRITERIA_INDEX_DIRECTORY = "faiss_index_full_criteria"
+QUALITY_CHECKLIST_PATH = "tools/quality_checklist.json"
+
+_resources = {}
+_lock = threading.RLock()
+
+# seconds spent loading each resource, keyed by resource name
+load_metrics = {}
+
+
+def _get_or_load(name: str, loader):
+    """Returns the named resource, loading it with loader the first time it is requested."""
+    if name in _resources:
+        return _resources[name]
+
+    with _lock:
+        if name not in _resources:
+            start = time.perf_counter()
+            _resources[name] = loader()
+            load_metrics[name] = time.perf_counter() - start
+    return _resources[name]
+
+
+def override(name: str, value) -> None:
+    """Replaces a resource, e.g. with a stand-in model when running offline."""
+    with _lock:
+        _resources[name] = value
+        load_metrics[name] = 0.0
+
+
+def reset() -> None:
+    """Drops every loaded resource so that the next request loads it again."""
+    with _lock:
+        _resources.clear()
+        load_metrics.clear()
+
+
+def get_core_recipe():
+    def load():
+        from papermage.recipes import CoreRecipe
+
+        return CoreRecipe()
+
+    return _get_or_load("core_recipe", load)
+
+
+def get_embeddings():
+    def load():
+        from langchain_openai import OpenAIEmbeddings
+
+        return cached_embeddings(OpenAIEmbeddings())
+
+    return _get_or_load("embeddings", load)
+
+
+def get_vectorstore():
+    def load():
+        from langchain_community.vectorstores import FAISS
+
+        from tools.vector_store import MMAP_INDEX_DIRECTORY, MmapVectorStore, is_current_export
+
+        # the memory-mapped export is shared between processes, the pickled store is copied into each one
+        if is_current_export(MMAP_INDEX_DIRECTORY, CRITERIA_INDEX_DIRECTORY):
+            return MmapVectorStore(MMAP_INDEX_DIRECTORY, get_embeddings())
+        if os.path.isdir(MMAP_INDEX_DIRECTORY):
+            print(f"{MMAP_INDEX_DIRECTORY} is out of date with {CRITERIA_INDEX_DIRECTORY}, loading the FAISS store instead.")
+        return FAISS.load_local(
+            CRITERIA_INDEX_DIRECTORY,
+            get_embeddings(),
+            allow_dangerous_deserialization=True,
+        )
+
+    return _get_or_load("vectorstore", load)
+
+
+def get_checklist() -> dict:
+    def load():
+        with open(QUALITY_CHECKLIST_PATH, "r") as file:
+            return json.load(file)
+
+    return _get_or_load("checklist", load)
+
+
+def get_instruct_llm():
+    def load():
+        from langchain_openai import OpenAI
+
+        install_llm_cache()
+        return OpenAI(temperature=0, model="gpt-3.5-turbo-instruct")
+
+    return _get_or_load("instruct_llm", load)
+
+
+def get_chat_llm():
+    def load():
+        from langchain_openai import ChatOpenAI
+
+        install_llm_cache()
+        return ChatOpenAI(temperature=0, model="gpt-4")
+
+    return _get_or_load("chat_llm", load)
+
+
+def get_summary_llm():
+    def load():
+        from langchain_openai import ChatOpenAI
+
+        install_llm_cache()
+        return ChatOpenAI(temperature=0, model="gpt-3.5-turbo")
+
+    return _get_or_load("summary_llm", load)
+
+
+def get_retrieval_qa():
+    def load():
+        from langchain.chains import RetrievalQA
+
+        retriever = get_vectorstore().as_retriever(
+            search_type="mmr", search_kwargs={"k": 8}
+        )
+        return RetrievalQA.from_chain_type(
+            llm=get_instruct_llm(),
+            chain_type="stuff",
+            retriever=retriever,
+            chain_type_kwargs={"verbose": tracing.VERBOSE},
+        )
+
+    return _get_or_load("retrieval_qa", load)
+
+
+def get_criteria_answers() -> dict:
+    def load():
+        from tools.criteria_answers import load_criteria_answers
+
+        return load_criteria_answers()
+
+    return _get_or_load("criteria_answers", load)
+
+
+def get_openreview_index():
+    def load():
+        from tools.openreview_index import OpenReviewIndex
+
+        return OpenReviewIndex()
+
+    return _get_or_load("openreview_index", load)
+
+
+def get_load_report() -> str:
+    """Returns a summary of the time spent loading each resource."""
+    lines = [f"{name}: {seconds:.3f}s" for name, seconds in load_metrics.items()]
+    lines.append(f"total: {sum(load_metrics.values()):.3f}s")
+    return "\n".join(lines)
+
+
+def get_cache_report() -> str:
+    """Returns the hit and miss counters of the model and embedding caches."""
+    stats = get_cache_stats(_resources.get("embeddings"))
+    return "\n".join(f"{name}: {count}" for name, count in stats.items())
+
+
+def warm_up() -> None:
+    """Loads every resource used by generate_review ahead of the first section."""
+    get_checklist()
+    get_criteria_answers()
+    get_retrieval_qa()
+    get_chat_llm()
@@ -0,0 +1,127 @@
+import os
+
+import numpy as np
+
+from tools import resources, tracing
+from tools.concurrency import call_with_rate_limit, map_bounded
+
+# subquestions whose embeddings are at least this similar are retrieved and answered once
+QUERY_DEDUP_THRESHOLD = float(os.environ.get("SE_EVAL_QUERY_DEDUP_THRESHOLD", "0.95"))
+# the search settings of the retriever of resources.get_retrieval_qa
+FETCH_K = 20
+LAMBDA_MULT = 0.5
+
+
+def embed_queries(queries: list) -> np.ndarray:
+    """Embeds all queries with one batched request and returns them as rows."""
+    queries = list(queries)
+    return np.array(
+        call_with_rate_limit(lambda: resources.get_embeddings().embed_documents(queries)), dtype=np.float32
+    )
+
+
+def dedupe_queries(vectors: np.ndarray, threshold: float = QUERY_DEDUP_THRESHOLD) -> list:
+    """
+    The function groups near-duplicate queries. Each query is assigned to the
+    first earlier query it is at least threshold cosine-similar to, or starts a
+    group of its own.
+
+    Parameters:
+        vectors (np.ndarray): the query embeddings, one per row
+        threshold (float): the cosine similarity above which two queries are duplicates
+
+    Returns:
+        list: the position of the representative query of every query
+    """
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    normalized = vectors / np.where(norms == 0, 1, norms)
+    similarities = normalized @ normalized.T
+    representatives = []
+    assigned = []
+    for i in range(len(vectors)):
+        match = next((j for j in representatives if similarities[i, j] >= threshold), None)
+        if match is None:
+            representatives.append(i)
+            match = i
+        assigned.append(match)
+    return assigned
+
+
+def batch_search(vectors: np.ndarray, k: int, fetch_k: int = FETCH_K, lambda_mult: float = LAMBDA_MULT) -> list:
+    """
+    The function runs the maximal marginal relevance search of the criteria
+    retriever for all query vectors, with a single index search for the FAISS
+    and memory-mapped stores. It returns the documents of every query.
+    """
+    from langchain_community.vectorstores.utils import maximal_marginal_relevance
+
+    vectorstore = resources.get_vectorstore()
+    if hasattr(vectorstore, "batch_max_marginal_relevance_search"):
+        return vectorstore.batch_max_marginal_relevance_search(vectors, k, fetch_k, lambda_mult)
+    index = getattr(vectorstore, "index", None)
+    if index is None:
+        # stores without a FAISS index are searched one query at a time, still without embedding requests
+        return [
+            vectorstore.max_marginal_relevance_search_by_vector(
+                vector.tolist(), k=k, fetch_k=fetch_k, lambda_mult=lambda_mult
+            )
+            for vector in vectors
+        ]
+
+    queries = np.array(vectors, dtype=np.float32)
+    if getattr(vectorstore, "_normalize_L2", False):
+        import faiss
+
+        faiss.normalize_L2(queries)
+    _, found = index.search(queries, fetch_k)
+    results = []
+    for vector, positions in zip(vectors, found):
+        positions = [int(position) for position in positions if position != -1]
+        selected = maximal_marginal_relevance(
+            vector.reshape(1, -1),
+            [index.reconstruct(position) for position in positions],
+            k=k,
+            lambda_mult=lambda_mult,
+        )
+        results.append([
+            vectorstore.docstore.search(vectorstore.index_to_docstore_id[positions[i]])
+            for i in selected
+        ])
+    return results
+
+
+def answer_subquestions(subquestions: list) -> dict:
+    """
+    The function answers subquestions against the criteria index. The
+    subquestions are embedded in one request, near-duplicates are collapsed,
+    the criteria are searched for all of them at once and every distinct
+    subquestion is answered from its documents by the question answering chain.
+
+    Parameters:
+        subquestions (list): the subquestions to answer
+
+    Returns:
+        dict: the answer of every subquestion, duplicates share the answer of their representative
+    """
+    subquestions = list(dict.fromkeys(subquestions))
+    if not subquestions:
+        return {}
+
+    qa = resources.get_retrieval_qa()
+    k = qa.retriever.search_kwargs.get("k", 4)
+    with tracing.span("batch_retrieval", queries=len(subquestions)) as retrieval_span:
+        vectors = embed_queries(subquestions)
+        assigned = dedupe_queries(vectors)
+        representatives = sorted(set(assigned))
+        documents = dict(zip(representatives, batch_search(vectors[representatives], k)))
+        retrieval_span.attributes["distinct_queries"] = len(representatives)
+
+    def answer(position: int) -> str:
+        with tracing.span("subquestion_qa", subquestion=subquestions[position]):
+            return call_with_rate_limit(lambda: qa.combine_documents_chain.invoke(
+                {"input_documents": documents[position], "question": subquestions[position]},
+                config=tracing.traced_config(),
+            ))["output_text"]
+
+    answers = dict(zip(representatives, map_bounded(answer, representatives)))
+    return {subquestion: answers[assigned[i]] for i, subquestion in enumerate(subquestions)}
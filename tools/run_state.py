@@ -0,0 +1,120 @@
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+
+from tools import tracing
+from tools.concurrency import retry_with_backoff
+
+RUN_STATE_PATH = os.path.join(".cache", "run_state.sqlite")
+RUN_STATE_ENABLED = os.environ.get("SE_EVAL_RUN_STATE", "1") != "0"
+
+# bump when the stored value of a stage changes
+RUN_STATE_FORMAT_VERSION = 1
+
+# the stages of a section review, in the order they run
+STAGES = ("summary", "questions", "definitions", "review")
+
+
+def run_key(manuscript_key: str, *settings: str) -> str:
+    """Returns the key of the run state of a manuscript reviewed with the given settings."""
+    digest = hashlib.sha256(f"v{RUN_STATE_FORMAT_VERSION}".encode("utf-8"))
+    for part in (manuscript_key,) + settings:
+        digest.update(b"\0" + str(part).encode("utf-8"))
+    return digest.hexdigest()
+
+
+class RunStateStore:
+    """
+    A durable record of the completed stages of every section review, kept in
+    a SQLite file. A stage is written once it has completed, so a review that
+    fails or is interrupted resumes from its last completed stage.
+    """
+
+    def __init__(self, database_path: str = RUN_STATE_PATH):
+        directory = os.path.dirname(database_path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._lock = threading.Lock()
+        self._connection = sqlite3.connect(database_path, timeout=30, check_same_thread=False)
+        with self._lock, self._connection:
+            self._connection.execute("PRAGMA journal_mode=WAL")
+            self._connection.execute(
+                "CREATE TABLE IF NOT EXISTS stages ("
+                "run_key TEXT NOT NULL, section_title TEXT NOT NULL, stage TEXT NOT NULL, "
+                "value TEXT NOT NULL, completed_at REAL NOT NULL, "
+                "PRIMARY KEY (run_key, section_title, stage))"
+            )
+
+    def get(self, key: str, section_title: str, stage: str):
+        """Returns the stored value of a completed stage, or None."""
+        with self._lock:
+            row = self._connection.execute(
+                "SELECT value FROM stages WHERE run_key = ? AND section_title = ? AND stage = ?",
+                (key, section_title, stage),
+            ).fetchone()
+        return json.loads(row[0]) if row is not None else None
+
+    def set(self, key: str, section_title: str, stage: str, value) -> None:
+        with self._lock, self._connection:
+            self._connection.execute(
+                "INSERT OR REPLACE INTO stages VALUES (?, ?, ?, ?, ?)",
+                (key, section_title, stage, json.dumps(value), time.time()),
+            )
+
+    def completed(self, key: str) -> dict:
+        """Returns the completed stages of every section of a run."""
+        with self._lock:
+            rows = self._connection.execute(
+                "SELECT section_title, stage FROM stages WHERE run_key = ?", (key,)
+            ).fetchall()
+        completed = {}
+        for section_title, stage in rows:
+            completed.setdefault(section_title, []).append(stage)
+        return completed
+
+    def clear(self, key: str) -> None:
+        with self._lock, self._connection:
+            self._connection.execute("DELETE FROM stages WHERE run_key = ?", (key,))
+
+
+_store = None
+_store_lock = threading.Lock()
+
+
+def get_store() -> RunStateStore:
+    global _store
+    with _store_lock:
+        if _store is None:
+            _store = RunStateStore()
+        return _store
+
+
+def run_stage(key: str, section_title: str, stage: str, func):
+    """
+    The function returns the stored result of a section stage, or runs func
+    with bounded retries and stores its result. Only the stage that failed runs
+    again when a review is retried or resumed.
+
+    Parameters:
+        key (str): the run key of the manuscript
+        section_title (str): the section the stage belongs to
+        stage (str): one of STAGES
+        func: computes the JSON-serializable result of the stage
+
+    Returns:
+        the result of the stage
+    """
+    if not RUN_STATE_ENABLED or key is None:
+        return retry_with_backoff(func)
+
+    store = get_store()
+    value = store.get(key, section_title, stage)
+    if value is not None:
+        tracing.annotate(**{f"resumed_{stage}": True})
+        return value
+    value = retry_with_backoff(func)
+    store.set(key, section_title, stage, value)
+    return value
@@ -0,0 +1,110 @@
+def _normalize_title(text: str) -> str:
+    return text.replace(" ", "")
+
+
+def iter_text_lines(path: str):
+    """
+    The function yields every text line of the manuscript in reading order as
+    (page_number, line_text) tuples. Page numbers start from 1. Long manuscripts
+    are extracted in page ranges across processes, the lines are yielded in
+    order, so a section title is found the same way whichever range it is in.
+    """
+    from tools.pdf_extract import iter_pdf_lines
+
+    return iter_pdf_lines(path)
+
+
+class SectionIndex:
+    """
+    An in-memory index of the manuscript sections built from a single pass over
+    the text lines. Each section title is mapped to the span of lines that makes
+    up its content, so the content of any section can be looked up directly.
+    """
+
+    def __init__(self, lines: list, pages: list, section_titles: list):
+        self.lines = lines
+        self.pages = pages
+        self.section_titles = list(section_titles)
+        self.spans = {}
+        self._contents = {}
+        self._build_spans()
+
+    @classmethod
+    def from_pdf(cls, path: str, section_titles: list) -> "SectionIndex":
+        """Builds the index by streaming through the manuscript once."""
+        return cls.from_lines(iter_text_lines(path), section_titles)
+
+    @classmethod
+    def from_lines(cls, text_lines, section_titles: list) -> "SectionIndex":
+        """Builds the index from an iterable of (page_number, line_text) tuples."""
+        lines = []
+        pages = []
+        for page_number, line_text in text_lines:
+            pages.append(page_number)
+            lines.append(line_text)
+        return cls(lines, pages, section_titles)
+
+    def _build_spans(self) -> None:
+        # positions of every line, grouped by its normalized text
+        positions = {}
+        for i, line_text in enumerate(self.lines):
+            positions.setdefault(_normalize_title(line_text), []).append(i)
+
+        for title_index, title in enumerate(self.section_titles):
+            if title in self.spans:
+                # duplicated titles always resolve to their first occurrence
+                continue
+
+            starts = positions.get(_normalize_title(title))
+            if not starts:
+                self.spans[title] = None
+                continue
+            start = starts[0] + 1
+            end = len(self.lines)
+
+            # the section ends at the first line matching the next title
+            next_title = None
+            if title_index < len(self.section_titles) - 1:
+                next_title = _normalize_title(self.section_titles[title_index + 1])
+            if next_title is not None and next_title != _normalize_title(title):
+                for position in positions.get(next_title, []):
+                    if position >= start:
+                        end = position
+                        break
+
+            self.spans[title] = (start, end)
+
+    def __contains__(self, section_title: str) -> bool:
+        return section_title in self.spans
+
+    def span(self, section_title: str):
+        """Returns the (start, end) line offsets of a section, or None if the title is never found."""
+        return self.spans.get(section_title)
+
+    def page_range(self, section_title: str):
+        """Returns the (first_page, last_page) of a section, or None if the title is never found."""
+        span = self.spans.get(section_title)
+        if span is None or span[0] >= span[1]:
+            return None
+        start, end = span
+        return self.pages[start], self.pages[end - 1]
+
+    def get_content(self, section_title: str) -> str:
+        """Returns the content of a section in the same format as a line-by-line scan."""
+        if section_title in self._contents:
+            return self._contents[section_title]
+
+        span = self.spans.get(section_title)
+        if span is None:
+            return ""
+        start, end = span
+        title = _normalize_title(section_title)
+
+        # lines repeating the section title are skipped, like the title itself
+        content = "".join(
+            line_text + "\n"
+            for line_text in self.lines[start:end]
+            if _normalize_title(line_text) != title
+        )
+        self._contents[section_title] = content
+        return content
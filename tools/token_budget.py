@@ -0,0 +1,113 @@
+import os
+import re
+
+# tokens of the whole prompt of one section review call, section content included
+REVIEW_PROMPT_TOKEN_BUDGET = int(os.environ.get("SE_EVAL_REVIEW_PROMPT_TOKENS", "6000"))
+# tokens a review call may generate
+REVIEW_OUTPUT_TOKEN_BUDGET = int(os.environ.get("SE_EVAL_REVIEW_OUTPUT_TOKENS", "1500"))
+# tokens of the assessment criteria and of the previous sections' summary in a review prompt
+DEFINITIONS_TOKEN_BUDGET = int(os.environ.get("SE_EVAL_DEFINITIONS_TOKENS", "2000"))
+CONTEXT_TOKEN_BUDGET = int(os.environ.get("SE_EVAL_CONTEXT_TOKENS", "500"))
+# tokens of section content sent with the question selection call
+SELECTION_TOKEN_BUDGET = int(os.environ.get("SE_EVAL_SELECTION_TOKENS", "3000"))
+# tokens of section content sent with the section summary call
+SUMMARY_TOKEN_BUDGET = int(os.environ.get("SE_EVAL_SUMMARY_TOKENS", "3000"))
+# upper bound on the chunks reviewed per section, the content beyond it is not reviewed
+MAX_REVIEW_CHUNKS = int(os.environ.get("SE_EVAL_MAX_REVIEW_CHUNKS", "6"))
+# a chunk is never made smaller than this, however large the rest of the prompt is
+MIN_CHUNK_TOKENS = 500
+
+_encoding = None
+
+# a line ending a sentence, followed by a line starting a new one, is taken
+# as a paragraph boundary since the extracted lines have no blank lines between paragraphs
+_paragraph_end = re.compile(r"(?<=[.!?:])\n(?=[A-Z0-9\[(•])")
+
+
+def _get_encoding():
+    global _encoding
+    if _encoding is None:
+        import tiktoken
+
+        try:
+            _encoding = tiktoken.encoding_for_model("gpt-4")
+        except Exception:
+            # the encoding is downloaded on first use, so offline runs estimate instead
+            _encoding = False
+    return _encoding
+
+
+def count_tokens(text: str) -> int:
+    """Returns the number of gpt-4 tokens in text."""
+    encoding = _get_encoding()
+    if encoding is False:
+        return len(text) // 4
+    return len(encoding.encode(text))
+
+
+def truncate_to_budget(text: str, budget: int) -> str:
+    """Returns the longest prefix of text that fits in budget tokens."""
+    if count_tokens(text) <= budget:
+        return text
+    encoding = _get_encoding()
+    if encoding is False:
+        return text[:budget * 4]
+    return encoding.decode(encoding.encode(text)[:budget])
+
+
+def split_paragraphs(text: str) -> list:
+    """Splits section content on blank lines, or on sentence-ending line breaks when there are none."""
+    paragraphs = [paragraph for paragraph in re.split(r"\n\s*\n", text) if paragraph.strip()]
+    if len(paragraphs) > 1:
+        return paragraphs
+    return [paragraph for paragraph in _paragraph_end.split(text) if paragraph.strip()]
+
+
+def split_to_budget(text: str, budget: int) -> list:
+    """
+    The function splits text into chunks of at most budget tokens. Chunks are
+    made of whole paragraphs, only a paragraph longer than the budget is split
+    between its lines, or cut when a single line is longer still.
+
+    Parameters:
+        text (str): the section content
+        budget (int): the token budget of a chunk
+
+    Returns:
+        list: the chunks, in the order of the text
+    """
+    if count_tokens(text) <= budget:
+        return [text]
+
+    pieces = []
+    for paragraph in split_paragraphs(text):
+        if count_tokens(paragraph) <= budget:
+            pieces.append(paragraph)
+            continue
+        for line in paragraph.splitlines():
+            while count_tokens(line) > budget:
+                head = truncate_to_budget(line, budget)
+                pieces.append(head)
+                line = line[len(head):]
+            if line.strip():
+                pieces.append(line)
+
+    chunks = []
+    current = []
+    current_tokens = 0
+    for piece in pieces:
+        piece_tokens = count_tokens(piece)
+        if current and current_tokens + piece_tokens > budget:
+            chunks.append("\n".join(current))
+            current = []
+            current_tokens = 0
+        current.append(piece)
+        current_tokens += piece_tokens
+    if current:
+        chunks.append("\n".join(current))
+    return chunks
+
+
+def chunk_budget(prompt_overhead: int) -> int:
+    """Returns the tokens left for section content in a review prompt with prompt_overhead other tokens."""
+    return max(MIN_CHUNK_TOKENS, REVIEW_PROMPT_TOKEN_BUDGET - prompt_overhead)
@@ -1,65 +1,152 @@
-from pdfminer.high_level import extract_pages
-from pdfminer.layout import LTTextContainer
-from langchain_openai import OpenAIEmbeddings
-from langchain_community.vectorstores import FAISS
-from langchain.chains import RetrievalQA
-from langchain_openai import OpenAI, ChatOpenAI
-from langchain.tools import tool
+from langchain_core.tools import tool
 from langchain_core.prompts.chat import ChatPromptTemplate
-from langchain_community.retrievers import BM25Retriever
-from papermage.recipes import CoreRecipe
+import hashlib
 import json
+import re
+import threading
+
+from tools import question_ranker, resources, retrieval, run_state, token_budget, tracing
+from tools.concurrency import call_with_rate_limit, map_bounded
+from tools.json_repair import MalformedOutputError, parse_feedback, repair_json
+from tools.parse_cache import cache_key, load_parsed_document
+from tools.quote_verifier import QuoteIndex
+from tools.section_index import SectionIndex
+
+path = None
+section_title_list = []
+section_index = None
+section_index_key = None
+section_index_lock = threading.Lock()
+quote_index = None
+# the questions selected for each section and the answers of their subquestions,
+# kept for the manuscript under review so they can be computed ahead for all sections
+question_selections = {}
+subquestion_answers = {}
+run_state_key = None
+
+# bump when a review, question selection or summary prompt changes, so that the
+# stages stored with the old prompts are not resumed
+PROMPT_VERSION = 1
+
+
+class UnknownSectionError(ValueError):
+    """Raised when a section is reviewed that is not a section title of the manuscript."""
 
 def load_path():
-    """Loads the local path to the manuscript"""
+    """Loads the local path to the manuscript and makes it the manuscript under review"""
     with open('tools/current_path.txt', 'r') as f:
-       global path 
-       path = f.read()
+       return set_path(f.read())
+
+def set_path(manuscript_path: str) -> str:
+    """Sets the manuscript under review and drops the state of the previous one"""
+    global path, section_title_list, section_index, section_index_key, quote_index
+    path = manuscript_path
+    section_title_list = []
+    section_index = None
+    section_index_key = None
+    quote_index = None
+    question_selections.clear()
+    subquestion_answers.clear()
+    global run_state_key
+    run_state_key = None
     return path
 
 def fetch_all_section_titles() -> list:
     global section_title_list
     section_title_list = []
-    recipe = CoreRecipe()
-    doc = recipe.run(path)
-    for section in doc.sections:
-        section_title_list.append(section.text)
+    doc = load_parsed_document(path)
+    for section_text in doc["sections"]:
+        section_title_list.append(section_text)
 
     return section_title_list
 
+def _get_section_index() -> SectionIndex:
+    """
+    The function returns the section index of the current manuscript. The index is
+    built with a single pass over the manuscript the first time it is needed and
+    rebuilt only when the manuscript path or its section titles change.
+    """
+    global section_index
+    with section_index_lock:
+        if (
+            section_index is None
+            or section_index_key != (path, tuple(section_title_list))
+        ):
+            _build_section_index()
+        return section_index
+
+
+def _build_section_index() -> None:
+    global section_index, section_index_key
+    with tracing.span("extract", path=path):
+        section_index = SectionIndex.from_pdf(path, section_title_list)
+    section_index_key = (path, tuple(section_title_list))
+
+
+def get_quote_index() -> QuoteIndex:
+    """
+    The function returns the quote index of the current manuscript, built from
+    the same extraction as the section index the first time it is needed.
+    """
+    global quote_index
+    index = _get_section_index()
+    with section_index_lock:
+        if quote_index is None or quote_index.lines is not index.lines:
+            with tracing.span("index_quotes", path=path):
+                quote_index = QuoteIndex.from_section_index(index)
+        return quote_index
+
+
+def _config_fingerprint() -> str:
+    # everything besides the manuscript that changes the stored stages of a review
+    config = {
+        "prompt_version": PROMPT_VERSION,
+        "checklist": resources.get_checklist(),
+        "selection": [
+            question_ranker.SELECTION_MODE,
+            question_ranker.CANDIDATE_QUESTIONS,
+            question_ranker.SELECTED_QUESTIONS,
+        ],
+        "token_budgets": [
+            token_budget.REVIEW_PROMPT_TOKEN_BUDGET,
+            token_budget.REVIEW_OUTPUT_TOKEN_BUDGET,
+            token_budget.DEFINITIONS_TOKEN_BUDGET,
+            token_budget.CONTEXT_TOKEN_BUDGET,
+            token_budget.SELECTION_TOKEN_BUDGET,
+            token_budget.SUMMARY_TOKEN_BUDGET,
+            token_budget.MAX_REVIEW_CHUNKS,
+        ],
+    }
+    return hashlib.sha256(json.dumps(config, sort_keys=True).encode("utf-8")).hexdigest()
+
+
+def get_run_key() -> str:
+    """Returns the key of the run state of the current manuscript, checklist, prompts and settings."""
+    global run_state_key
+    if run_state_key is None:
+        run_state_key = run_state.run_key(cache_key(path), _config_fingerprint())
+    return run_state_key
+
+
+def completed_stages() -> dict:
+    """Returns the review stages already completed for every section of the current manuscript."""
+    if not run_state.RUN_STATE_ENABLED:
+        return {}
+    return run_state.get_store().completed(get_run_key())
+
+
+def clear_run_state() -> None:
+    """Drops the completed stages of the current manuscript, so that its next review starts afresh."""
+    if run_state.RUN_STATE_ENABLED:
+        run_state.get_store().clear(get_run_key())
+
+
 def _fetch_section_content_by_titles(section_title: str) -> str:
     """
     The function fetechs the content of a manuscript section for the given section
     title.
     """
-    content_started = False
-    content = ""
-    next_index = 0
-    is_last_section = section_title_list.index(section_title) == len(section_title_list) - 1
-
-    for page_layout in extract_pages(path):
-        for element in page_layout:
-            if isinstance(element, LTTextContainer):
-                for text_line in element:
-                    line_text = text_line.get_text().strip()
-
-                    # records the start of a section
-                    if line_text.replace(" ", "") == section_title.replace(" ", ""):
-                        content_started = True
-                        next_index = section_title_list.index(section_title) + 1
-                        continue
-
-                    # returns the content if reaches the next section title
-                    if content_started:
-                        if not is_last_section:
-                            if (
-                                line_text.replace(" ", "")
-                                == section_title_list[next_index].replace(" ", "")
-                            ):
-                                return content
-                        content += line_text + "\n"
-
-    return content
+    return _get_section_index().get_content(section_title)
 
 @tool
 def generate_review(section_title: str) -> str: 
@@ -73,40 +160,73 @@ def generate_review(section_title: str) -> str:
     Returns:
         str: The response answering the given question that evaluates the section content.
     """
-    load_path()
-    assert section_title in section_title_list, "It seems like you have not provided a correct section titlte. Please use one of the section titles that was provided to you."
-    section_content = _fetch_section_content_by_titles(section_title)
+    try:
+        return review_section(section_title)["review"]
+    except UnknownSectionError as error:
+        # the agent is told to pick another title instead of the run failing
+        return str(error)
 
-    embeddings = OpenAIEmbeddings()
-    vectorstore = FAISS.load_local(
-        "faiss_index_full_criteria",
-        embeddings,
-        allow_dangerous_deserialization=True,
-    )
-    retriever = vectorstore.as_retriever(search_type="mmr", search_kwargs={"k": 8})
-    llm = OpenAI(temperature=0, model='gpt-3.5-turbo-instruct')
-    qa = RetrievalQA.from_chain_type(
-        llm=llm,
-        chain_type="stuff",
-        retriever=retriever,
-        chain_type_kwargs={"verbose": True},
-    )
+def review_section(section_title: str, context: str = "") -> dict:
+    """
+    The function reviews a manuscript section against the checklist questions
+    selected for it.
 
-    question_dict = _get_criteria_questions(section_content)
+    Parameters:
+        section_title (str): the title of the manuscript section
+        context (str): an optional summary of the previous sections
+
+    Returns:
+        dict: the "review" text, the "criteria" aspects and the "questions" it was
+        reviewed against, and the "seconds" the review took
+    """
+    with tracing.span("section", section_title=section_title) as section_span:
+        result = _review_section(section_title, context)
+    result["seconds"] = section_span.wall_seconds
+    return result
+
+def _review_section(section_title: str, context: str) -> dict:
+    if path is None:
+        load_path()
+    if section_title not in section_title_list:
+        raise UnknownSectionError(
+            "It seems like you have not provided a correct section titlte. Please use one of the section "
+            "titles that was provided to you: " + ", ".join(section_title_list)
+        )
+    # every stage of the review is stored once it completes, a retried or
+    # resumed review only runs the stages that have not completed yet; the
+    # stages run one after the other, so each is retried on its own
+    question_dict = select_section_questions(section_title)
     eval_questions = []
-    definitions = {}
+    subquestions = []
 
     for value in question_dict.values():
         for q in value:
             eval_questions.append(q['Question'])
             for subquestion in q['Subquestions']:
-                result = qa.invoke(subquestion)['result']
-                definitions[subquestion] = result
+                if subquestion not in subquestions:
+                    subquestions.append(subquestion)
+
+    definitions = get_section_definitions(section_title, subquestions)
+    return run_state.run_stage(
+        get_run_key(),
+        section_title,
+        "review",
+        lambda: _write_review(section_title, context, question_dict, eval_questions, definitions),
+    )
+
+def _write_review(section_title: str, context: str, question_dict: dict, eval_questions: list, definitions: dict) -> dict:
+    section_content = _fetch_section_content_by_titles(section_title)
 
-    definitions_str = "\n".join(f"{key}: {value}" for key, value in definitions.items())
+    # the criteria and the summary of the previous sections have fixed budgets,
+    # the rest of the prompt budget is left for the section content
+    definitions_str = token_budget.truncate_to_budget(
+        "\n".join(f"{key}: {value}" for key, value in definitions.items()),
+        token_budget.DEFINITIONS_TOKEN_BUDGET,
+    )
+    context = token_budget.truncate_to_budget(context, token_budget.CONTEXT_TOKEN_BUDGET)
     questions_str = "\n".join(q for q in eval_questions)
 
-    chat = ChatOpenAI(temperature=0, model='gpt-4')
+    chat = resources.get_chat_llm()
 
     template = """
 You are a review committee member at an established software engineering conference. You will be given a section 
@@ -144,6 +264,12 @@ Please remember to leave comments on all parts of the section that are relevant
         Your comments:
     """
 
+    if context:
+        human_template = """
+        Summary of the previous sections:
+        {context}
+""" + human_template
+
     chat_prompt = ChatPromptTemplate.from_messages(
         [
             ("system",template),
@@ -151,24 +277,123 @@ Please remember to leave comments on all parts of the section that are relevant
         ]
     )
 
-    chat_prompt.format(section_content=section_content, definitions_str=definitions_str, questions_str=questions_str)
+    prompt_inputs = {
+        "definitions_str": definitions_str,
+        "questions_str": questions_str,
+    }
+    if context:
+        prompt_inputs["context"] = context
+
+    chain = chat_prompt | chat.bind(max_tokens=token_budget.REVIEW_OUTPUT_TOKEN_BUDGET)
+
+    # an oversized section is split on paragraph boundaries into chunks that fit
+    # the prompt budget, which are reviewed concurrently and merged
+    prompt_overhead = token_budget.count_tokens(chat_prompt.format(section_content="", **prompt_inputs))
+    chunks = token_budget.split_to_budget(section_content, token_budget.chunk_budget(prompt_overhead))
+    if len(chunks) > token_budget.MAX_REVIEW_CHUNKS:
+        skipped_tokens = sum(token_budget.count_tokens(chunk) for chunk in chunks[token_budget.MAX_REVIEW_CHUNKS:])
+        print(f"Section {section_title} exceeds the review budget, its last {skipped_tokens} tokens are not reviewed")
+        tracing.annotate(skipped_tokens=skipped_tokens)
+        chunks = chunks[:token_budget.MAX_REVIEW_CHUNKS]
+    tracing.annotate(chunks=len(chunks))
+
+    def review_chunk(position: int) -> str:
+        chunk = chunks[position]
+        if len(chunks) > 1:
+            chunk = f"[Part {position + 1} of {len(chunks)} of the section]\n{chunk}"
+        with tracing.span("final_review", chunk=position):
+            res = call_with_rate_limit(
+                lambda: chain.invoke(dict(prompt_inputs, section_content=chunk), config=tracing.traced_config())
+            )
+        return res.content
+
+    if len(chunks) == 1:
+        review = review_chunk(0)
+    else:
+        review = _merge_chunk_reviews(map_bounded(review_chunk, range(len(chunks))))
+    return {
+        "review": review,
+        "criteria": list(question_dict.keys()),
+        "questions": eval_questions,
+    }
+
+def _merge_chunk_reviews(reviews: list) -> str:
+    """
+    The function merges the reviews of the chunks of a section into one
+    {"Feedback": [...]} blob. Items repeating the manuscript text and comment of
+    an earlier item are dropped, and a chunk review without any JSON blob is
+    kept as text after the blob.
+    """
+    def normalize(text) -> str:
+        return re.sub(r"\s+", " ", str(text)).strip().lower()
+
+    feedback = []
+    seen = set()
+    unparsed = []
+    for review in reviews:
+        items = parse_feedback(review)
+        if not items:
+            unparsed.append(review)
+        for item in items:
+            key = (normalize(item.get("Manuscript Text", "")), normalize(item.get("Comment", "")))
+            if key not in seen:
+                seen.add(key)
+                feedback.append(item)
+    return "\n\n".join([json.dumps({"Feedback": feedback}, indent=4)] + unparsed)
+
+def select_section_questions(section_title: str, section_content: str = None) -> dict:
+    """Returns the checklist questions selected for a section, selecting them the first time."""
+    if section_title not in question_selections:
+        def select():
+            content = section_content
+            if content is None:
+                content = _fetch_section_content_by_titles(section_title)
+            with tracing.span("select_questions", section_title=section_title):
+                return _get_criteria_questions(content)
+
+        question_selections[section_title] = run_state.run_stage(get_run_key(), section_title, "questions", select)
+    return question_selections[section_title]
+
+def get_section_definitions(section_title: str, subquestions: list) -> dict:
+    """
+    Returns the answer of every subquestion of a section. Precomputed answers and
+    the answers already found for this manuscript are used where available, the
+    rest are retrieved and answered in one batch.
+    """
+    def define():
+        answer_subquestions(subquestions)
+        criteria_answers = resources.get_criteria_answers()
+        return {
+            subquestion: criteria_answers.get(subquestion, subquestion_answers.get(subquestion))
+            for subquestion in subquestions
+        }
 
-    chain = chat_prompt | chat
+    return run_state.run_stage(get_run_key(), section_title, "definitions", define)
 
-    res = chain.invoke(
-        {
-            "section_content": section_content,
-            "definitions_str": definitions_str,
-            "questions_str": questions_str,
-        }
-    )
-    return res.content
+def answer_subquestions(subquestions: list) -> None:
+    """Answers the subquestions that have neither a precomputed answer nor an answer for this manuscript yet"""
+    criteria_answers = resources.get_criteria_answers()
+    unanswered = [
+        subquestion for subquestion in dict.fromkeys(subquestions)
+        if subquestion not in criteria_answers and subquestion not in subquestion_answers
+    ]
+    if unanswered:
+        subquestion_answers.update(retrieval.answer_subquestions(unanswered))
 
 def _get_criteria_questions(section_content: str) -> dict:
-    llm = ChatOpenAI(temperature=0, model="gpt-4")
+    full_checklist = resources.get_checklist()
+    checklist = full_checklist
+    mode = question_ranker.SELECTION_MODE
+
+    if mode == "fast":
+        question_ranker.record_selection(mode, full_checklist)
+        return question_ranker.select_questions_locally(full_checklist, section_content)
+    if mode == "hybrid":
+        # only the locally ranked candidates are sent to the model
+        checklist = question_ranker.candidate_checklist(full_checklist, section_content)
+    question_ranker.record_selection(mode, full_checklist, checklist)
 
-    with open("tools/quality_checklist.json", "r") as file:
-        checklist = json.load(file)
+    llm = resources.get_chat_llm()
 
     template = """
 You are a review committee member at an established software engineering conference. You will be given 
@@ -217,17 +442,39 @@ Return all questions in JSON format. Do not add any other words in this JSON blo
 
     chain = chat_prompt | llm
 
-    res = chain.invoke(
+    res = call_with_rate_limit(lambda: chain.invoke(
         {
-            "section_content": section_content,
+            "section_content": token_budget.truncate_to_budget(section_content, token_budget.SELECTION_TOKEN_BUDGET),
             "checklist": checklist,
-        }
-    )
-
-    selected_questions = json.loads(res.content)
+        },
+        config=tracing.traced_config(),
+    ))
+
+    # a malformed answer is repaired where possible, otherwise the selection is retried
+    selected_questions = repair_json(res.content)
+    if not _is_question_selection(selected_questions):
+        raise MalformedOutputError(f"the question selection is not in the checklist format: {res.content[:200]!r}")
+
+    if mode == "llm":
+        # the local ranking is scored against the model to measure its quality
+        local_selection = question_ranker.select_questions_locally(full_checklist, section_content)
+        tracing.annotate(**{
+            f"local_{name}": value
+            for name, value in question_ranker.compare_selection(local_selection, selected_questions).items()
+        })
 
     return selected_questions
 
+def _is_question_selection(selection) -> bool:
+    return isinstance(selection, dict) and all(
+        isinstance(questions, list)
+        and all(
+            isinstance(q, dict) and isinstance(q.get("Question"), str) and isinstance(q.get("Subquestions"), list)
+            for q in questions
+        )
+        for questions in selection.values()
+    )
+
 @tool
 def get_openreview_reviews() -> list:
     """
@@ -241,45 +488,25 @@ def get_openreview_reviews() -> list:
     Returns:
         list: A list of reviews for similar research papers
     """
-    path = path.strip('"\'')
-    paper_abstract = _get_paper_abstract(path)
+    manuscript_path = path.strip('"\'')
+    paper_abstract = _get_paper_abstract(manuscript_path)
     indexes = _find_similiar_paper(paper_abstract)
     reviews = []
 
-    with open("correct_file.json", "r") as file:
-        data = json.load(file)
-        for index in indexes:
-            for paper in data["orb_submissions"][index]["article_versions"].values():
-                reviews.append((paper["title"], paper["reviews"]))
+    openreview_index = resources.get_openreview_index()
+    for index in indexes:
+        reviews.extend(openreview_index.get_reviews(index))
     return reviews
 
 
-def _find_similiar_paper(paper_abstract: list) -> list:
-    db_paper_abstracts = []
-    indexes = []
-
-    with open("correct_file.json", "r") as file:
-        data = json.load(file)
-        for submission in data["orb_submissions"]:
-            if "0" in submission["article_versions"]:
-                paper = submission["article_versions"]["0"]  # only need one version
-                if paper["title"] and paper["abstract"] and (paper["reviews"] != []):
-                    db_paper_abstracts.append(paper["title"] + ": " + paper["abstract"])
-                    print(paper["title"] + ": " + paper["abstract"] + "\n\n")
-                else:
-                    db_paper_abstracts.append("")
-    
-    retriever = BM25Retriever.from_texts(db_paper_abstracts) # k: number of documents
-
-    similiar_paper = retriever.invoke(paper_abstract)
-
-    for paper in similiar_paper:
-        indexes.append(db_paper_abstracts.index(paper.to_json()["kwargs"]["page_content"]))
-
-    return indexes
+def _find_similiar_paper(paper_abstract: str) -> list:
+    """
+    The function returns the ids of the OpenReview submissions most similar to the
+    given abstract, using the prebuilt BM25 index.
+    """
+    return resources.get_openreview_index().search(paper_abstract)
 
 
-def _get_paper_abstract() -> str:
-    recipe = CoreRecipe()
-    doc = recipe.run(path)
-    return doc.titles[0].text + ": " + doc.abstracts[0].text
+def _get_paper_abstract(manuscript_path: str = None) -> str:
+    doc = load_parsed_document(manuscript_path or path)
+    return doc["titles"][0] + ": " + doc["abstracts"][0]
@@ -0,0 +1,242 @@
+import contextlib
+import contextvars
+import json
+import os
+import threading
+import time
+import uuid
+
+from langchain_core.callbacks import BaseCallbackHandler
+
+TRACE_DIRECTORY = "traces"
+# set SE_EVAL_VERBOSE=1 to get the LangChain verbose terminal output back
+VERBOSE = os.environ.get("SE_EVAL_VERBOSE", "0") == "1"
+
+_current_span = contextvars.ContextVar("current_span", default=None)
+
+
+class Span:
+    """A timed stage of a run. Counters of nested model calls are added to it."""
+
+    def __init__(self, name: str, parent, attributes: dict):
+        self.span_id = uuid.uuid4().hex[:16]
+        self.parent_id = parent.span_id if parent is not None else None
+        self.name = name
+        self.attributes = attributes
+        self.start = time.time()
+        self.end = None
+        self.tokens_in = 0
+        self.tokens_out = 0
+        self.cache_hits = 0
+        self.retries = 0
+        self.error = None
+
+    @property
+    def wall_seconds(self) -> float:
+        return (self.end or time.time()) - self.start
+
+    def to_dict(self) -> dict:
+        return {
+            "span_id": self.span_id,
+            "parent_id": self.parent_id,
+            "name": self.name,
+            "start": self.start,
+            "end": self.end,
+            "wall_seconds": self.wall_seconds,
+            "tokens_in": self.tokens_in,
+            "tokens_out": self.tokens_out,
+            "cache_hits": self.cache_hits,
+            "retries": self.retries,
+            "error": self.error,
+            "attributes": self.attributes,
+        }
+
+
+class Tracer:
+    """Collects the spans of one run and exports them as JSONL."""
+
+    def __init__(self, run_name: str = "run"):
+        self.run_id = f"{time.strftime('%Y%m%d-%H%M%S')}-{run_name}-{uuid.uuid4().hex[:6]}"
+        self.spans = []
+        self._lock = threading.Lock()
+
+    def add(self, span: Span) -> None:
+        with self._lock:
+            self.spans.append(span)
+
+    def export(self, directory: str = TRACE_DIRECTORY) -> str:
+        """Writes one JSON line per span and returns the path of the trace file."""
+        os.makedirs(directory, exist_ok=True)
+        trace_path = os.path.join(directory, f"{self.run_id}.jsonl")
+        with open(trace_path, "w") as file:
+            for span in self.spans:
+                file.write(json.dumps(dict(span.to_dict(), run_id=self.run_id)) + "\n")
+        return trace_path
+
+    def summary(self) -> dict:
+        """Aggregates the spans by name."""
+        stages = {}
+        for span in self.spans:
+            stage = stages.setdefault(
+                span.name,
+                {
+                    "count": 0,
+                    "wall_seconds": 0.0,
+                    "max_wall_seconds": 0.0,
+                    "tokens_in": 0,
+                    "tokens_out": 0,
+                    "cache_hits": 0,
+                    "retries": 0,
+                    "errors": 0,
+                },
+            )
+            stage["count"] += 1
+            stage["wall_seconds"] += span.wall_seconds
+            stage["max_wall_seconds"] = max(stage["max_wall_seconds"], span.wall_seconds)
+            stage["tokens_in"] += span.tokens_in
+            stage["tokens_out"] += span.tokens_out
+            stage["cache_hits"] += span.cache_hits
+            stage["retries"] += span.retries
+            stage["errors"] += span.error is not None
+        return stages
+
+    def summary_report(self) -> str:
+        lines = [
+            f"Trace {self.run_id}",
+            f"{'stage':<24}{'count':>7}{'wall s':>10}{'max s':>9}{'tok in':>10}{'tok out':>9}{'cache':>7}{'retry':>7}",
+        ]
+        for name, stage in sorted(self.summary().items(), key=lambda item: -item[1]["wall_seconds"]):
+            lines.append(
+                f"{name:<24}{stage['count']:>7}{stage['wall_seconds']:>10.2f}{stage['max_wall_seconds']:>9.2f}"
+                f"{stage['tokens_in']:>10}{stage['tokens_out']:>9}{stage['cache_hits']:>7}{stage['retries']:>7}"
+            )
+        return "\n".join(lines)
+
+
+_tracer = Tracer()
+
+
+def start_run(run_name: str = "run") -> Tracer:
+    """Starts collecting the spans of a new run."""
+    global _tracer
+    _tracer = Tracer(run_name)
+    return _tracer
+
+
+def finish_run(directory: str = TRACE_DIRECTORY) -> str:
+    """Exports the current run, writes and prints its summary report, and returns the trace path."""
+    trace_path = _tracer.export(directory)
+    report = _tracer.summary_report()
+    with open(os.path.join(directory, f"{_tracer.run_id}.summary.txt"), "w") as file:
+        file.write(report + "\n")
+    print(report)
+    print(f"Trace written to {trace_path}")
+    return trace_path
+
+
+def current_tracer() -> Tracer:
+    return _tracer
+
+
+@contextlib.contextmanager
+def span(name: str, **attributes):
+    """Records the enclosed block as a span nested under the current one."""
+    new_span = Span(name, _current_span.get(), attributes)
+    _tracer.add(new_span)
+    token = _current_span.set(new_span)
+    try:
+        yield new_span
+    except BaseException as error:
+        new_span.error = repr(error)
+        raise
+    finally:
+        new_span.end = time.time()
+        _current_span.reset(token)
+
+
+def annotate(**attributes) -> None:
+    """Adds attributes to the current span, if there is one."""
+    current = _current_span.get()
+    if current is not None:
+        current.attributes.update(attributes)
+
+
+def record(tokens_in: int = 0, tokens_out: int = 0, cache_hits: int = 0, retries: int = 0) -> None:
+    """Adds counters to the current span, if there is one."""
+    current = _current_span.get()
+    if current is None:
+        return
+    current.tokens_in += tokens_in
+    current.tokens_out += tokens_out
+    current.cache_hits += cache_hits
+    current.retries += retries
+
+
+class TracingCallbackHandler(BaseCallbackHandler):
+    """Records every model call and retrieval as a span with its token usage and retries."""
+
+    def __init__(self):
+        self._spans = {}
+
+    def _start(self, name: str, run_id, **attributes) -> None:
+        new_span = Span(name, _current_span.get(), attributes)
+        _tracer.add(new_span)
+        self._spans[run_id] = new_span
+
+    def _end(self, run_id, error: BaseException = None):
+        ended = self._spans.pop(run_id, None)
+        if ended is not None:
+            ended.end = time.time()
+            if error is not None:
+                ended.error = repr(error)
+        return ended
+
+    def on_llm_start(self, serialized, prompts, *, run_id, **kwargs):
+        self._start("model_call", run_id, model=_model_name(serialized, kwargs))
+
+    def on_chat_model_start(self, serialized, messages, *, run_id, **kwargs):
+        self._start("model_call", run_id, model=_model_name(serialized, kwargs))
+
+    def on_llm_end(self, response, *, run_id, **kwargs):
+        ended = self._end(run_id)
+        usage = (response.llm_output or {}).get("token_usage") or {}
+        tokens_in = usage.get("prompt_tokens", 0)
+        tokens_out = usage.get("completion_tokens", 0)
+        if ended is not None:
+            ended.tokens_in += tokens_in
+            ended.tokens_out += tokens_out
+        # the enclosing stage accumulates the tokens of its model calls
+        record(tokens_in=tokens_in, tokens_out=tokens_out)
+
+    def on_llm_error(self, error, *, run_id, **kwargs):
+        self._end(run_id, error)
+
+    def on_retriever_start(self, serialized, query, *, run_id, **kwargs):
+        self._start("retrieval", run_id)
+
+    def on_retriever_end(self, documents, *, run_id, **kwargs):
+        ended = self._end(run_id)
+        if ended is not None:
+            ended.attributes["documents"] = len(documents)
+
+    def on_retriever_error(self, error, *, run_id, **kwargs):
+        self._end(run_id, error)
+
+    def on_retry(self, retry_state, *, run_id, **kwargs):
+        current = self._spans.get(run_id)
+        if current is not None:
+            current.retries += 1
+        record(retries=1)
+
+
+def _model_name(serialized: dict, kwargs: dict) -> str:
+    params = kwargs.get("invocation_params") or {}
+    return params.get("model_name") or params.get("model") or (serialized or {}).get("name", "unknown")
+
+
+callback_handler = TracingCallbackHandler()
+
+
+def traced_config(callbacks: list = None) -> dict:
+    """Returns the invoke config that reports the calls of a chain to the tracer."""
+    return {"callbacks": [callback_handler] + list(callbacks or [])}
@@ -0,0 +1,219 @@
+import json
+import os
+import shutil
+import sqlite3
+import threading
+from typing import Any, Iterable, List, Optional
+
+import numpy as np
+from langchain_core.documents import Document
+from langchain_core.embeddings import Embeddings
+from langchain_core.vectorstores import VectorStore
+
+MMAP_INDEX_DIRECTORY = "criteria_index_mmap"
+
+# bump when the on-disk layout of the store changes
+MMAP_INDEX_FORMAT_VERSION = 1
+
+
+def _source_stamp(source_directory: str) -> dict:
+    # the size and modification time of every file of the FAISS index, to tell when an export is stale
+    stamp = {}
+    if source_directory and os.path.isdir(source_directory):
+        for filename in sorted(os.listdir(source_directory)):
+            stat = os.stat(os.path.join(source_directory, filename))
+            stamp[filename] = [stat.st_size, stat.st_mtime]
+    return stamp
+
+
+def export_vectorstore(vectorstore, directory: str = MMAP_INDEX_DIRECTORY, source_directory: str = None) -> int:
+    """
+    The function exports a langchain FAISS store to a raw float32 vector file
+    and a SQLite docstore, which can be memory-mapped and shared by every
+    process without unpickling anything.
+
+    Parameters:
+        vectorstore (FAISS): the store to export
+        directory (str): where to write the export
+        source_directory (str): the directory the FAISS store was saved to, so
+            a later change of the store can be detected
+
+    Returns:
+        int: the number of exported vectors
+    """
+    count = vectorstore.index.ntotal
+    vectors = vectorstore.index.reconstruct_n(0, count) if count else np.zeros((0, vectorstore.index.d))
+
+    # the export is written next to the old one and swapped in, so readers never see half of it
+    staging_directory = directory + ".tmp"
+    shutil.rmtree(staging_directory, ignore_errors=True)
+    os.makedirs(staging_directory)
+
+    np.save(os.path.join(staging_directory, "vectors.npy"), np.ascontiguousarray(vectors, dtype=np.float32))
+    connection = sqlite3.connect(os.path.join(staging_directory, "docstore.sqlite"))
+    with connection:
+        connection.execute(
+            "CREATE TABLE documents (position INTEGER PRIMARY KEY, id TEXT, page_content TEXT, metadata TEXT)"
+        )
+        connection.executemany(
+            "INSERT INTO documents VALUES (?, ?, ?, ?)",
+            (
+                (position, doc_id, document.page_content, json.dumps(document.metadata))
+                for position, doc_id in sorted(vectorstore.index_to_docstore_id.items())
+                for document in [vectorstore.docstore.search(doc_id)]
+            ),
+        )
+    connection.close()
+    with open(os.path.join(staging_directory, "meta.json"), "w") as file:
+        json.dump(
+            {
+                "version": MMAP_INDEX_FORMAT_VERSION,
+                "count": int(count),
+                "dimension": int(vectorstore.index.d),
+                "normalize_L2": bool(getattr(vectorstore, "_normalize_L2", False)),
+                "source": _source_stamp(source_directory),
+            },
+            file,
+        )
+
+    shutil.rmtree(directory, ignore_errors=True)
+    os.replace(staging_directory, directory)
+    return int(count)
+
+
+def is_current_export(directory: str = MMAP_INDEX_DIRECTORY, source_directory: str = None) -> bool:
+    """Returns whether directory holds an export of the current format, made from the current source store."""
+    try:
+        with open(os.path.join(directory, "meta.json"), "r") as file:
+            meta = json.load(file)
+    except (OSError, ValueError):
+        return False
+    if meta.get("version") != MMAP_INDEX_FORMAT_VERSION:
+        return False
+    return source_directory is None or meta.get("source") == _source_stamp(source_directory)
+
+
+class MmapVectorStore(VectorStore):
+    """
+    A read-only vector store over an export_vectorstore directory. The vectors
+    are memory-mapped, so every process shares the same pages through the OS
+    cache, and documents are read from SQLite only for the search results.
+    Distances are squared L2, like the FAISS flat index it was exported from.
+    """
+
+    def __init__(self, directory: str = MMAP_INDEX_DIRECTORY, embeddings: Embeddings = None):
+        self.directory = directory
+        self.embedding_function = embeddings
+        with open(os.path.join(directory, "meta.json"), "r") as file:
+            self.meta = json.load(file)
+        if self.meta["version"] != MMAP_INDEX_FORMAT_VERSION:
+            raise ValueError(
+                f"{directory} was exported with an older format, export it again with export_criteria_index.py."
+            )
+        self.vectors = np.load(os.path.join(directory, "vectors.npy"), mmap_mode="r")
+        self._squared_norms = None
+        self._local = threading.local()
+
+    @property
+    def embeddings(self) -> Optional[Embeddings]:
+        return self.embedding_function
+
+    def _connection(self) -> sqlite3.Connection:
+        # sqlite connections are not shared between threads
+        connection = getattr(self._local, "connection", None)
+        if connection is None:
+            database_path = os.path.abspath(os.path.join(self.directory, "docstore.sqlite"))
+            connection = sqlite3.connect(f"file:{database_path}?mode=ro", uri=True)
+            self._local.connection = connection
+        return connection
+
+    def get_documents(self, positions: list) -> list:
+        """Returns the documents at the given vector positions, in that order."""
+        positions = [int(position) for position in positions]
+        if not positions:
+            return []
+        rows = self._connection().execute(
+            f"SELECT position, id, page_content, metadata FROM documents WHERE position IN ({','.join('?' * len(positions))})",
+            positions,
+        ).fetchall()
+        documents = {
+            position: Document(page_content=page_content, metadata=json.loads(metadata))
+            for position, _, page_content, metadata in rows
+        }
+        return [documents[position] for position in positions]
+
+    def _prepare_queries(self, embeddings) -> np.ndarray:
+        queries = np.array(embeddings, dtype=np.float32).reshape(-1, self.vectors.shape[1])
+        if self.meta["normalize_L2"]:
+            norms = np.linalg.norm(queries, axis=1, keepdims=True)
+            queries = queries / np.where(norms == 0, 1, norms)
+        return queries
+
+    def search(self, queries: np.ndarray, k: int) -> tuple:
+        """
+        The function returns the squared L2 distances and positions of the k
+        nearest vectors of every query row, nearest first.
+        """
+        if self._squared_norms is None:
+            self._squared_norms = np.einsum("ij,ij->i", self.vectors, self.vectors)
+        k = min(k, len(self.vectors))
+        if k == 0:
+            return np.zeros((len(queries), 0), dtype=np.float32), np.zeros((len(queries), 0), dtype=np.int64)
+
+        distances = (
+            self._squared_norms[:, None]
+            - 2 * (self.vectors @ queries.T)
+            + np.einsum("ij,ij->i", queries, queries)[None, :]
+        ).T
+        nearest = np.argpartition(distances, k - 1, axis=1)[:, :k]
+        nearest_distances = np.take_along_axis(distances, nearest, axis=1)
+        order = np.argsort(nearest_distances, axis=1, kind="stable")
+        return np.take_along_axis(nearest_distances, order, axis=1), np.take_along_axis(nearest, order, axis=1)
+
+    def similarity_search_with_score_by_vector(self, embedding: List[float], k: int = 4, **kwargs: Any) -> list:
+        distances, positions = self.search(self._prepare_queries(embedding), k)
+        return list(zip(self.get_documents(positions[0]), distances[0].tolist()))
+
+    def similarity_search_by_vector(self, embedding: List[float], k: int = 4, **kwargs: Any) -> List[Document]:
+        return [document for document, _ in self.similarity_search_with_score_by_vector(embedding, k)]
+
+    def similarity_search_with_score(self, query: str, k: int = 4, **kwargs: Any) -> list:
+        return self.similarity_search_with_score_by_vector(self.embedding_function.embed_query(query), k)
+
+    def similarity_search(self, query: str, k: int = 4, **kwargs: Any) -> List[Document]:
+        return [document for document, _ in self.similarity_search_with_score(query, k)]
+
+    def batch_max_marginal_relevance_search(
+        self, embeddings, k: int = 4, fetch_k: int = 20, lambda_mult: float = 0.5
+    ) -> list:
+        """Runs the maximal marginal relevance search of every query embedding with one distance computation."""
+        from langchain_community.vectorstores.utils import maximal_marginal_relevance
+
+        embeddings = np.array(embeddings, dtype=np.float32).reshape(-1, self.vectors.shape[1])
+        _, found = self.search(self._prepare_queries(embeddings), fetch_k)
+        results = []
+        for embedding, positions in zip(embeddings, found):
+            selected = maximal_marginal_relevance(
+                embedding.reshape(1, -1), np.asarray(self.vectors[positions]), k=k, lambda_mult=lambda_mult
+            )
+            results.append(self.get_documents([positions[i] for i in selected]))
+        return results
+
+    def max_marginal_relevance_search_by_vector(
+        self, embedding: List[float], k: int = 4, fetch_k: int = 20, lambda_mult: float = 0.5, **kwargs: Any
+    ) -> List[Document]:
+        return self.batch_max_marginal_relevance_search([embedding], k, fetch_k, lambda_mult)[0]
+
+    def max_marginal_relevance_search(
+        self, query: str, k: int = 4, fetch_k: int = 20, lambda_mult: float = 0.5, **kwargs: Any
+    ) -> List[Document]:
+        return self.max_marginal_relevance_search_by_vector(
+            self.embedding_function.embed_query(query), k, fetch_k, lambda_mult
+        )
+
+    def add_texts(self, texts: Iterable[str], metadatas: Optional[List[dict]] = None, **kwargs: Any) -> List[str]:
+        raise NotImplementedError("MmapVectorStore is read-only, export the FAISS store again instead.")
+
+    @classmethod
+    def from_texts(cls, texts: List[str], embedding: Embeddings, metadatas: Optional[List[dict]] = None, **kwargs):
+        raise NotImplementedError("MmapVectorStore is read-only, build it with export_vectorstore.")